@@ -0,0 +1,91 @@
+"""Bounded, plaintext-free memoization for password analysis results."""
+
+from __future__ import annotations
+
+import hashlib
+import secrets
+from collections import OrderedDict
+from typing import Any, NamedTuple
+
+_KEY_BYTES = 32
+_DIGEST_BYTES = 16
+
+
+class CacheInfo(NamedTuple):
+    """Hit/miss statistics in the style of `functools.lru_cache`."""
+
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class AnalysisCache:
+    """Size-bounded LRU cache keyed by a keyed BLAKE2b digest of the password.
+
+    Plaintexts are never stored: entries are indexed by a MAC under a random
+    per-session key, so cache contents cannot be matched against a wordlist
+    without that key. `secure_clear` drops every entry and zeroes and rotates
+    the key.
+    """
+
+    def __init__(self, maxsize: int = 4096) -> None:
+        if maxsize <= 0:
+            raise ValueError("maxsize must be greater than zero")
+        self.maxsize = maxsize
+        self._key = bytearray(secrets.token_bytes(_KEY_BYTES))
+        self._entries: OrderedDict[bytes, Any] = OrderedDict()
+        self._namespaces: set[str] = set()
+        self.hits = 0
+        self.misses = 0
+
+    def _digest(self, pwd: str, namespace: str) -> bytes:
+        h = hashlib.blake2b(key=self._key, digest_size=_DIGEST_BYTES)
+        h.update(namespace.encode("utf-8"))
+        h.update(b"\x00")
+        h.update(pwd.encode("utf-8"))
+        return h.digest()
+
+    def get(self, pwd: str, namespace: str = "") -> Any | None:
+        """Return the cached value for `pwd`, or None, updating hit/miss counters."""
+        digest = self._digest(pwd, namespace)
+        value = self._entries.get(digest)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(digest)
+        self.hits += 1
+        return value
+
+    def put(self, pwd: str, namespace: str, value: Any) -> None:
+        digest = self._digest(pwd, namespace)
+        self._namespaces.add(namespace)
+        self._entries[digest] = value
+        self._entries.move_to_end(digest)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, pwd: str) -> None:
+        """Drop any cached results for `pwd`."""
+        for namespace in self._namespaces:
+            self._entries.pop(self._digest(pwd, namespace), None)
+
+    def clear(self) -> None:
+        """Drop all entries, e.g. after the scoring configuration changed."""
+        self._entries.clear()
+
+    def secure_clear(self) -> None:
+        """Drop all entries and statistics, zero the digest key and draw a new one."""
+        self._entries.clear()
+        self._namespaces.clear()
+        for i in range(len(self._key)):
+            self._key[i] = 0
+        self._key = bytearray(secrets.token_bytes(_KEY_BYTES))
+        self.hits = 0
+        self.misses = 0
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
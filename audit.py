@@ -0,0 +1,103 @@
+"""Bulk strength auditing across worker processes.
+
+Input lines are cut into chunks and analyzed on a process pool; each worker opens
+the dictionary and breach indexes once (they are memory-mapped, so pages are shared
+between workers). A bounded number of chunks is kept in flight, so memory stays flat
+on arbitrarily large inputs. Results come back in input order, or as soon as each
+chunk finishes with `ordered=False`.
+"""
+
+from __future__ import annotations
+
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import Iterable, Iterator
+
+from strength_checker import PasswordAnalysis, analyze_passwords, use_breach_index, use_dictionary
+
+AUDIT_FLAGS = ("common", "sequence", "keyboard", "repeats")
+
+_CHUNK_SIZE = 2048
+_INFLIGHT_PER_JOB = 4
+
+_worker_scoring = "entropy"
+
+
+def _numbered(lines: Iterable[str]) -> Iterator[tuple[int, str]]:
+    for lineno, line in enumerate(lines, 1):
+        pwd = line.rstrip("\r\n")
+        if pwd:
+            yield lineno, pwd
+
+
+def _init_worker(scoring: str, dictionary: str | None, breach_index: str | None) -> None:
+    global _worker_scoring
+    _worker_scoring = scoring
+    if dictionary:
+        use_dictionary(dictionary)
+    if breach_index:
+        use_breach_index(breach_index)
+
+
+def _audit_chunk(linenos: list[int], passwords: list[str]) -> list[tuple[int, PasswordAnalysis]]:
+    records = analyze_passwords(passwords, as_records=True, chunk_size=len(passwords), scoring=_worker_scoring)
+    return list(zip(linenos, records, strict=True))
+
+
+def audit_lines(
+    lines: Iterable[str],
+    jobs: int = 1,
+    chunk_size: int = _CHUNK_SIZE,
+    ordered: bool = True,
+    scoring: str = "entropy",
+    dictionary: str | None = None,
+    breach_index: str | None = None,
+) -> Iterator[tuple[int, PasswordAnalysis]]:
+    """Analyze one password per line and yield `(line number, record)` pairs.
+
+    Blank lines are skipped. `jobs=0` uses every CPU; `jobs=1` runs in-process.
+    `dictionary` and `breach_index` are index paths opened in each worker process;
+    in-process runs use the caller's `use_dictionary` / `use_breach_index` setup and
+    leave it untouched.
+    """
+    if jobs < 0:
+        raise ValueError("jobs must be non-negative")
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be greater than zero")
+    jobs = jobs or os.cpu_count() or 1
+
+    numbered = _numbered(lines)
+    chunks = iter(lambda: list(islice(numbered, chunk_size)), [])
+
+    if jobs == 1:
+        for chunk in chunks:
+            linenos, passwords = zip(*chunk, strict=True)
+            records = analyze_passwords(passwords, as_records=True, chunk_size=len(passwords), scoring=scoring)
+            yield from zip(linenos, records, strict=True)
+        return
+
+    max_inflight = jobs * _INFLIGHT_PER_JOB
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(scoring, dictionary, breach_index)) as pool:
+        in_order: deque[Future[list[tuple[int, PasswordAnalysis]]]] = deque()
+        running: set[Future[list[tuple[int, PasswordAnalysis]]]] = set()
+        for chunk in chunks:
+            linenos, passwords = zip(*chunk, strict=True)
+            future = pool.submit(_audit_chunk, list(linenos), list(passwords))
+            if ordered:
+                in_order.append(future)
+                if len(in_order) >= max_inflight:
+                    yield from in_order.popleft().result()
+            else:
+                running.add(future)
+                if len(running) >= max_inflight:
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    for finished in done:
+                        yield from finished.result()
+        while in_order:
+            yield from in_order.popleft().result()
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for finished in done:
+                yield from finished.result()
@@ -0,0 +1,180 @@
+"""Offline breach-corpus lookups against a local SHA-1 prefix index.
+
+A HIBP-style dump (`SHA1HEX:count` per line, any order) is compiled once into a
+prefix-bucketed index: a table of 65,537 record offsets keyed by the first two digest
+bytes, followed by fixed-width `(digest suffix, count)` records sorted by digest.
+Lookups memory-map the file, read two bucket offsets and binary-search one bucket, so
+each query touches O(log n) pages and never uses the network.
+
+    python breach.py build -o pwned.phb pwned-passwords-sha1-ordered-by-hash.txt
+"""
+
+from __future__ import annotations
+
+import argparse
+import binascii
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from pathlib import Path
+from typing import Iterable
+
+from indexfile import SpillPartitions, fingerprint
+
+_MAGIC = b"PHABRIDX"
+_VERSION = 1
+_HEADER = struct.Struct(">8sHHQ")  # magic, version, prefix bytes, count
+_PREFIX_BYTES = 2
+_BUCKETS = 1 << (8 * _PREFIX_BYTES)
+_OFFSET = struct.Struct(">Q")
+_SUFFIX_BYTES = 20 - _PREFIX_BYTES
+_RECORD = struct.Struct(f">{_SUFFIX_BYTES}sI")  # digest suffix, count
+_SPILL = struct.Struct(">20sI")  # full digest, count
+_MAX_COUNT = 0xFFFFFFFF
+
+
+def _parse_line(line: bytes, lineno: int) -> tuple[bytes, int] | None:
+    line = line.strip()
+    if not line:
+        return None
+    hexpart, _, count = line.partition(b":")
+    try:
+        digest = binascii.unhexlify(hexpart)
+        seen = int(count) if count else 1
+    except (binascii.Error, ValueError):
+        raise ValueError(f"Malformed breach dump line {lineno}: expected 'SHA1HEX:count'") from None
+    if len(digest) != 20:
+        raise ValueError(f"Malformed breach dump line {lineno}: expected a 40-character SHA-1 digest")
+    return digest, seen
+
+
+def build_breach_index(dump_paths: Iterable[str | Path], out_path: str | Path, tmp_dir: str | Path | None = None) -> int:
+    """Compile `SHA1HEX:count` dumps into an index file and return the number of digests.
+
+    Input need not be sorted: digests are spilled into 256 partitions by first byte and
+    each partition is sorted in memory, so peak memory is about 1/256 of the dump.
+    Repeated digests have their counts summed.
+    """
+    with SpillPartitions(tmp_dir) as spill:
+        for path in dump_paths:
+            with open(path, "rb") as fh:
+                for lineno, line in enumerate(fh, 1):
+                    parsed = _parse_line(line, lineno)
+                    if parsed is not None:
+                        digest, seen = parsed
+                        spill.add(digest[0], _SPILL.pack(digest, min(seen, _MAX_COUNT)))
+
+        bucket_sizes = [0] * _BUCKETS
+        total = 0
+        with open(out_path, "wb") as out:
+            table_offset = _HEADER.size
+            out.write(_HEADER.pack(_MAGIC, _VERSION, _PREFIX_BYTES, 0))
+            out.write(bytes(_OFFSET.size * (_BUCKETS + 1)))
+            for data in spill.drain():
+                merged: dict[bytes, int] = {}
+                for digest, seen in _SPILL.iter_unpack(data):
+                    merged[digest] = min(merged.get(digest, 0) + seen, _MAX_COUNT)
+                del data
+                for digest in sorted(merged):
+                    out.write(_RECORD.pack(digest[_PREFIX_BYTES:], merged[digest]))
+                    bucket_sizes[int.from_bytes(digest[:_PREFIX_BYTES], "big")] += 1
+                total += len(merged)
+
+            offsets = bytearray()
+            running = 0
+            for size in bucket_sizes:
+                offsets += _OFFSET.pack(running)
+                running += size
+            offsets += _OFFSET.pack(running)
+            out.seek(0)
+            out.write(_HEADER.pack(_MAGIC, _VERSION, _PREFIX_BYTES, total))
+            out.seek(table_offset)
+            out.write(offsets)
+    return total
+
+
+class BreachIndex:
+    """Read-only, memory-mapped view of a compiled breach index."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        with open(self.path, "rb") as fh:
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            stat = os.fstat(fh.fileno())
+        try:
+            if len(self._mm) < _HEADER.size:
+                raise ValueError(f"Not a breach index: {self.path}")
+            magic, version, prefix_bytes, count = _HEADER.unpack_from(self._mm, 0)
+            if magic != _MAGIC:
+                raise ValueError(f"Not a breach index: {self.path}")
+            if version != _VERSION or prefix_bytes != _PREFIX_BYTES:
+                raise ValueError(f"Unsupported breach index version: {version}")
+            self._count = count
+            self._table_offset = _HEADER.size
+            self._records_offset = _HEADER.size + _OFFSET.size * (_BUCKETS + 1)
+            if len(self._mm) != self._records_offset + count * _RECORD.size:
+                raise ValueError(f"Truncated or corrupted breach index: {self.path}")
+            self.fingerprint = fingerprint(self._mm[: _HEADER.size], stat)
+        except Exception:
+            self._mm.close()
+            raise
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, password: object) -> bool:
+        return isinstance(password, str) and self.count(password) > 0
+
+    def count(self, password: str) -> int:
+        """Return how many times `password` appears in the breach corpus (0 if never)."""
+        return self.count_digest(hashlib.sha1(password.encode("utf-8")).digest())
+
+    def count_digest(self, digest: bytes) -> int:
+        """Return the breach count for a raw 20-byte SHA-1 digest."""
+        mm = self._mm
+        bucket = int.from_bytes(digest[:_PREFIX_BYTES], "big")
+        (lo,) = _OFFSET.unpack_from(mm, self._table_offset + bucket * _OFFSET.size)
+        (hi,) = _OFFSET.unpack_from(mm, self._table_offset + (bucket + 1) * _OFFSET.size)
+        suffix = digest[_PREFIX_BYTES:]
+        base = self._records_offset
+        size = _RECORD.size
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            start = base + mid * size
+            probe = mm[start : start + _SUFFIX_BYTES]
+            if probe < suffix:
+                lo = mid + 1
+            elif probe > suffix:
+                hi = mid
+            else:
+                return _RECORD.unpack_from(mm, start)[1]
+        return 0
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def __enter__(self) -> BreachIndex:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Compile a SHA1:count breach dump into an offline lookup index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Build an index from HIBP-style SHA1:count dumps")
+    build.add_argument("dumps", nargs="+", help="Input dump files")
+    build.add_argument("--output", "-o", required=True, help="Index file to write")
+    build.add_argument("--tmp-dir", help="Directory for temporary spill files (needs about the dump's size / 2)")
+    args = parser.parse_args(argv)
+
+    count = build_breach_index(args.dumps, args.output, args.tmp_dir)
+    print(f"Indexed {count} breached digests into {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
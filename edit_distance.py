@@ -0,0 +1,83 @@
+"""Bit-parallel edit distances for short strings such as passwords.
+
+`levenshtein` implements Myers' bit-vector algorithm and `damerau_levenshtein` Hyyrö's
+extension with adjacent transpositions (the optimal string alignment distance). One
+column of the dynamic-programming matrix is encoded in a handful of machine words,
+so each character of the text costs a constant number of integer operations while
+the pattern fits in 64 bits; Python integers keep longer patterns correct.
+
+Both functions take an optional `max_distance` and return None as soon as the final
+distance is certain to exceed it.
+"""
+
+from __future__ import annotations
+
+
+def pattern_masks(pattern: str) -> dict[str, int]:
+    """Per-character bitmasks of the positions where each character occurs in `pattern`.
+
+    Callers comparing one string against many can build these once and pass them
+    as `masks`.
+    """
+    masks: dict[str, int] = {}
+    bit = 1
+    for ch in pattern:
+        masks[ch] = masks.get(ch, 0) | bit
+        bit <<= 1
+    return masks
+
+
+def _distance(
+    pattern: str, text: str, max_distance: int | None, masks: dict[str, int] | None, transpositions: bool
+) -> int | None:
+    m, n = len(pattern), len(text)
+    if m == 0 or n == 0:
+        distance = m or n
+        return None if max_distance is not None and distance > max_distance else distance
+    if max_distance is not None and abs(m - n) > max_distance:
+        return None
+    if masks is None:
+        masks = pattern_masks(pattern)
+
+    full = (1 << m) - 1
+    last = 1 << (m - 1)
+    vp, vn = full, 0
+    d0 = prev_eq = 0
+    score = m
+    for j, ch in enumerate(text, 1):
+        eq = masks.get(ch, 0)
+        if transpositions:
+            tr = (((~d0) & eq) << 1) & prev_eq
+            prev_eq = eq
+            d0 = ((((eq & vp) + vp) & full) ^ vp) | eq | vn | tr
+        else:
+            d0 = ((((eq & vp) + vp) & full) ^ vp) | eq | vn
+        hp = vn | (~(d0 | vp) & full)
+        hn = d0 & vp
+        if hp & last:
+            score += 1
+        elif hn & last:
+            score -= 1
+        # The bottom row can drop by at most one per remaining text character.
+        if max_distance is not None and score - (n - j) > max_distance:
+            return None
+        x = ((hp << 1) | 1) & full
+        vn = x & d0
+        vp = ((hn << 1) & full) | (~(x | d0) & full)
+    return None if max_distance is not None and score > max_distance else score
+
+
+def levenshtein(a: str, b: str, max_distance: int | None = None, masks: dict[str, int] | None = None) -> int | None:
+    """Insertions, deletions and substitutions needed to turn `a` into `b`.
+
+    `masks` may hold `pattern_masks(a)`. Returns None when the distance exceeds `max_distance`.
+    """
+    return _distance(a, b, max_distance, masks, transpositions=False)
+
+
+def damerau_levenshtein(a: str, b: str, max_distance: int | None = None, masks: dict[str, int] | None = None) -> int | None:
+    """Like `levenshtein`, but swapping two adjacent characters also costs one edit.
+
+    This is the optimal string alignment variant: a transposed pair is not edited again.
+    """
+    return _distance(a, b, max_distance, masks, transpositions=True)
@@ -5,6 +5,8 @@ from __future__ import annotations
 import secrets
 import string
 
+import metrics
+
 
 def generate_password(
     length: int = 16,
@@ -34,11 +36,13 @@ def generate_password(
     if length < len(categories):
         raise ValueError("Length must be at least the number of enabled categories")
 
+    started = metrics.clock()
     pool = "".join(categories)
     password_chars = [secrets.choice(cat) for cat in categories]
     remaining = length - len(password_chars)
     for _ in range(remaining):
         password_chars.append(secrets.choice(pool))
     secrets.SystemRandom().shuffle(password_chars)
+    metrics.observe("generate", started)
     return "".join(password_chars)
 
@@ -0,0 +1,212 @@
+"""Pattern-based guess-count estimation in the style of zxcvbn.
+
+A password is decomposed into dictionary words (with case and leetspeak variations),
+keyboard walks, monotonic sequences, repeats and dates. A dynamic-programming pass
+then picks the cover of the password, mixing matches with brute-forced characters,
+that minimizes the total number of guesses. Work is proportional to the password
+length times the number of candidate matches; all lookups hit precomputed rank
+tables or a compiled `wordlist` index.
+
+This is a simplification of zxcvbn: guesses multiply across a cover without the
+factorial sequence-length term, and only maximal keyboard and sequence spans are
+considered. Values are tracked as log10 so long passwords cannot overflow.
+"""
+
+from __future__ import annotations
+
+import datetime
+import math
+import re
+from typing import Callable, NamedTuple
+
+from patterns import SequenceDetector
+from wordlist import leet_key
+
+RankLookup = Callable[[str], "int | None"]
+
+BRUTEFORCE_CARDINALITY = 10
+MIN_SUBMATCH_GUESSES_SINGLE_CHAR = 10
+MIN_SUBMATCH_GUESSES_MULTI_CHAR = 50
+MIN_DICTIONARY_WORD_LENGTH = 3
+MAX_DICTIONARY_WORD_LENGTH = 24
+MIN_YEAR_SPACE = 20
+REFERENCE_YEAR = datetime.date.today().year
+
+_LOG10_BRUTEFORCE = math.log10(BRUTEFORCE_CARDINALITY)
+_REPEAT_RE = re.compile(r"(.+?)\1+")
+_YEAR_RE = re.compile(r"(?<!\d)(?:19|20)\d\d(?!\d)")
+_DMY_RE = re.compile(r"(?<!\d)(\d{1,2})([-/._ ]?)(\d{1,2})\2((?:19|20)?\d\d)(?!\d)")
+_YMD_RE = re.compile(r"(?<!\d)((?:19|20)\d\d)([-/._ ]?)(\d{1,2})\2(\d{1,2})(?!\d)")
+_SEQUENCE_OBVIOUS_STARTS = frozenset("aAzZ019")
+_DEFAULT_DETECTOR = SequenceDetector()
+
+
+class GuessMatch(NamedTuple):
+    """One element of the minimum-guesses cover of a password."""
+
+    pattern: str
+    start: int
+    end: int
+    token: str
+    guesses_log10: float
+
+
+class GuessEstimate(NamedTuple):
+    """Estimated guesses for a password and the cover that produced it."""
+
+    guesses_log10: float
+    sequence: list[GuessMatch]
+
+    @property
+    def guesses(self) -> float:
+        return 10.0**self.guesses_log10 if self.guesses_log10 < 308 else math.inf
+
+
+def _uppercase_variations(token: str) -> int:
+    if token == token.lower():
+        return 1
+    if token == token.upper() or token[1:] == token[1:].lower() or token[:-1] == token[:-1].lower():
+        return 2
+    upper = sum(1 for c in token if c.isupper())
+    lower = sum(1 for c in token if c.islower())
+    return sum(math.comb(upper + lower, i) for i in range(1, min(upper, lower) + 1)) or 1
+
+
+def _leet_variations(token: str) -> int:
+    substituted = sum(1 for c in token if not c.isalpha() and leet_key(c) != c)
+    return 2**substituted if substituted else 1
+
+
+def _year_space(year: int) -> int:
+    return max(abs(year - REFERENCE_YEAR), MIN_YEAR_SPACE)
+
+
+def _full_year(year: str) -> int:
+    value = int(year)
+    if len(year) == 4:
+        return value
+    return value + (1900 if value > 50 else 2000)
+
+
+def _dictionary_matches(pwd: str, low: str, rank: RankLookup, leet_rank: RankLookup | None) -> list[GuessMatch]:
+    matches: list[GuessMatch] = []
+    n = len(low)
+    for i in range(n):
+        for j in range(i + MIN_DICTIONARY_WORD_LENGTH, min(n, i + MAX_DICTIONARY_WORD_LENGTH) + 1):
+            word = low[i:j]
+            token = pwd[i:j]
+            found = rank(word)
+            variations = _uppercase_variations(token)
+            if found is None and leet_rank is not None:
+                found = leet_rank(word)
+                variations *= _leet_variations(token)
+            if found is not None:
+                matches.append(GuessMatch("dictionary", i, j, token, math.log10(found * variations)))
+    return matches
+
+
+def _pattern_matches(pwd: str, low: str, detector: SequenceDetector) -> list[GuessMatch]:
+    matches: list[GuessMatch] = []
+    starting_keys = sum(len(row) for row in detector.rows)
+    for found in detector.find(low):
+        token = pwd[found.start : found.end]
+        length = found.end - found.start
+        if found.kind == "keyboard":
+            guesses = starting_keys * 2 * (length - 1) * _uppercase_variations(token)
+        else:
+            base = 4 if token[0] in _SEQUENCE_OBVIOUS_STARTS else 10 if token[0].isdigit() else 26
+            if ord(token[1]) < ord(token[0]):
+                base *= 2
+            guesses = base * length
+        matches.append(GuessMatch(found.kind, found.start, found.end, token, math.log10(guesses)))
+    return matches
+
+
+def _date_matches(pwd: str) -> list[GuessMatch]:
+    matches: list[GuessMatch] = []
+    for m in _YEAR_RE.finditer(pwd):
+        matches.append(GuessMatch("date", m.start(), m.end(), m.group(), math.log10(_year_space(int(m.group())))))
+    for regex, (day_group, month_group, year_group) in ((_DMY_RE, (1, 3, 4)), (_YMD_RE, (4, 3, 1))):
+        for m in regex.finditer(pwd):
+            day, month = int(m.group(day_group)), int(m.group(month_group))
+            if not (1 <= day <= 31 and 1 <= month <= 31 and (day <= 12 or month <= 12)):
+                continue
+            guesses = _year_space(_full_year(m.group(year_group))) * 365 * (4 if m.group(2) else 1)
+            matches.append(GuessMatch("date", m.start(), m.end(), m.group(), math.log10(guesses)))
+    return matches
+
+
+def _repeat_matches(pwd: str, rank: RankLookup, leet_rank: RankLookup | None, detector: SequenceDetector) -> list[GuessMatch]:
+    matches: list[GuessMatch] = []
+    for m in _REPEAT_RE.finditer(pwd):
+        unit = m.group(1)
+        count = len(m.group()) // len(unit)
+        unit_log10 = estimate_guesses(unit, rank, leet_rank, detector).guesses_log10
+        matches.append(GuessMatch("repeat", m.start(), m.end(), m.group(), unit_log10 + math.log10(count)))
+    return matches
+
+
+def _minimum_guesses(pwd: str, matches: list[GuessMatch]) -> GuessEstimate:
+    n = len(pwd)
+    by_end: list[list[GuessMatch]] = [[] for _ in range(n + 1)]
+    for match in matches:
+        by_end[match.end].append(match)
+
+    best = [0.0] * (n + 1)
+    back: list[GuessMatch | None] = [None] * (n + 1)
+    for j in range(1, n + 1):
+        best[j] = best[j - 1] + _LOG10_BRUTEFORCE
+        back[j] = None
+        for match in by_end[j]:
+            floor = MIN_SUBMATCH_GUESSES_SINGLE_CHAR if match.end - match.start == 1 else MIN_SUBMATCH_GUESSES_MULTI_CHAR
+            cost = best[match.start] + max(match.guesses_log10, math.log10(floor))
+            if cost < best[j]:
+                best[j] = cost
+                back[j] = match
+
+    sequence: list[GuessMatch] = []
+    j = n
+    while j > 0:
+        match = back[j]
+        if match is not None:
+            sequence.append(match)
+            j = match.start
+            continue
+        # Extend the brute-force run back to the previous match boundary.
+        start = j - 1
+        while start > 0 and back[start] is None:
+            start -= 1
+        sequence.append(GuessMatch("bruteforce", start, j, pwd[start:j], (j - start) * _LOG10_BRUTEFORCE))
+        j = start
+    sequence.reverse()
+    return GuessEstimate(best[n], sequence)
+
+
+def estimate_guesses(
+    pwd: str,
+    rank: RankLookup,
+    leet_rank: RankLookup | None = None,
+    detector: SequenceDetector | None = None,
+) -> GuessEstimate:
+    """Estimate how many guesses an informed attacker needs for `pwd`.
+
+    `rank` and `leet_rank` map a lowercased candidate word to its dictionary rank
+    (or None); `detector` supplies keyboard and sequence spans.
+    """
+    if not pwd:
+        return GuessEstimate(0.0, [])
+    detector = detector if detector is not None else _DEFAULT_DETECTOR
+    low = pwd.lower()
+    matches: list[GuessMatch] = []
+    # Match offsets index into the lowercased text; skip the rare inputs where lowercasing changes length.
+    if len(low) == len(pwd):
+        matches += _dictionary_matches(pwd, low, rank, leet_rank)
+        matches += _pattern_matches(pwd, low, detector)
+    matches += _date_matches(pwd)
+    matches += _repeat_matches(pwd, rank, leet_rank, detector)
+    return _minimum_guesses(pwd, matches)
+
+
+def guesses_to_score(guesses_log10: float) -> int:
+    """Map log10(guesses) onto the 0-10 scale; 10^14 guesses or more scores 10."""
+    return max(0, min(10, int(guesses_log10 / 1.4)))
@@ -5,12 +5,15 @@ from __future__ import annotations
 import logging
 import tkinter as tk
 import tkinter.font as tkfont
+from pathlib import Path
 from tkinter import filedialog, messagebox, simpledialog, ttk
+from typing import Callable
 
 from generator import generate_password
-from reuse_detector import detect_reuse
-from storage import load_passwords, save_passwords
-from strength_checker import analyze_password, score_password
+from reuse_detector import SIMILARITY_METRICS, ReuseIndex
+from storage import VaultAnalysis, VaultSession
+from strength_checker import analysis_cache, analyze_password, disable_analysis_cache, enable_analysis_cache, score_password
+from vault_health import WEAK_SCORE, HealthReport, assess, to_vault_analysis
 
 log = logging.getLogger(__name__)
 
@@ -51,7 +54,16 @@ class PasswordHealthAnalyzerApp(tk.Tk):
         self.minsize(700, 500)
         self.passwords: list[str] = []
         self.dark_mode_var = tk.BooleanVar(value=False)
+        self.reuse_metric_var = tk.StringVar(value="ratio")
+        self._reuse_index: ReuseIndex | None = None
+        self.vault: VaultSession | None = None
+        # True while the open vault holds `self.passwords`, so changes can be journaled by index.
+        self._vault_synced = False
+        # Stored analysis aligned with `self.passwords`; entries changed since are None.
+        self.analysis: VaultAnalysis | None = None
+        self.autosave_var = tk.BooleanVar(value=False)
         self.default_font = tkfont.Font(family="Segoe UI", size=11)
+        enable_analysis_cache()
         self._apply_modern_theme()
         self._build_ui()
         self._bind_shortcuts()
@@ -115,6 +127,10 @@ class PasswordHealthAnalyzerApp(tk.Tk):
         reuse_btn = ttk.Button(btn_frame, text="Check Reuses", command=self.check_reuse_all, style="Secondary.TButton")
         reuse_btn.pack(side="left", padx=(8, 0))
 
+        metric_box = ttk.Combobox(btn_frame, textvariable=self.reuse_metric_var, values=SIMILARITY_METRICS, state="readonly", width=11)
+        metric_box.pack(side="left", padx=(4, 0))
+        metric_box.bind("<<ComboboxSelected>>", lambda e: self._reset_reuse_index())
+
         clear_btn = ttk.Button(btn_frame, text="Clear List", command=self.clear_list, style="Danger.TButton")
         clear_btn.pack(side="left", padx=(8, 0))
 
@@ -127,6 +143,9 @@ class PasswordHealthAnalyzerApp(tk.Tk):
         dark_mode_btn = ttk.Checkbutton(btn_frame, text="Dark Mode", variable=self.dark_mode_var, command=self._toggle_dark_mode)
         dark_mode_btn.pack(side="left", padx=(8, 0))
 
+        autosave_btn = ttk.Checkbutton(btn_frame, text="Autosave", variable=self.autosave_var)
+        autosave_btn.pack(side="left", padx=(8, 0))
+
         self.strength_label = tk.Label(btn_frame, text="Score: -", font=("Segoe UI", 12))
         self.strength_label.pack(side="right")
 
@@ -190,9 +209,11 @@ class PasswordHealthAnalyzerApp(tk.Tk):
             add_btn: "Add the password to the list",
             analyze_btn: "Analyze the strength of the last added password",
             reuse_btn: "Check for password reuses in the list",
+            metric_box: "Similarity used for reuse checks (ratio, Levenshtein or Damerau edit distance)",
             clear_btn: "Clear the password list",
             save_btn: "Save the password list (encrypted)",
             load_btn: "Load a saved password list",
+            autosave_btn: "Write each change to the open vault as it happens",
             gen_btn: "Generate a new secure password",
             copy_btn: "Copy the generated password to clipboard",
             edit_btn: "Edit the selected password",
@@ -205,8 +226,12 @@ class PasswordHealthAnalyzerApp(tk.Tk):
             messagebox.showinfo("Empty", "Enter a password to add.")
             return
         self.passwords.append(pwd)
+        self._update_reuse_index(lambda index: index.add(pwd))
+        self._analysis_changed(lambda entries: entries.append(None))
         self.refresh_listbox()
         self.password_entry.delete(0, "end")
+        self._autosave(lambda vault: vault.add(pwd))
+        self._warn_reuse(pwd)
         log.info("Added password; total=%d", len(self.passwords))
 
     def analyze_last_password(self) -> None:
@@ -225,7 +250,8 @@ class PasswordHealthAnalyzerApp(tk.Tk):
             f"Common: {res['common']}\n"
             f"Sequence: {res['sequence']}\n"
             f"Keyboard: {res['keyboard']}\n"
-            f"Repeats: {res['repeats']}"
+            f"Repeats: {res['repeats']}\n"
+            f"Breach count: {res['breach_count']}"
         )
         self._set_results(details)
         log.info("Analyzed last; score=%d", s)
@@ -237,28 +263,88 @@ class PasswordHealthAnalyzerApp(tk.Tk):
         self.progress.start()
         self.update_idletasks()
         try:
-            res = detect_reuse(self.passwords)
+            exact = self.reuse_index.exact()
             out = "Reuse Check:\n"
-            if res["exact"]:
+            if exact:
                 out += "Exact duplicates:\n"
-                for p, c in res["exact"].items():
+                for p, c in exact.items():
                     out += f" - '{self._mask(p)}' used {c} times\n"
             else:
                 out += "No exact duplicates.\n"
-            if res["similar"]:
-                out += "Similar passwords:\n"
-                for a, b, sim in res["similar"]:
-                    out += f" - '{self._mask(a)}' ~ '{self._mask(b)}' ({sim:.2f})\n"
+            clusters = self.reuse_index.clusters()
+            if clusters:
+                out += "Similar password groups:\n"
+                for cluster in clusters:
+                    out += f" - '{self._mask(cluster.representative)}' and {len(cluster.members) - 1} similar\n"
             else:
                 out += "No similar passwords.\n"
             self._set_results(out)
-            log.info("Reuse check done; exact=%d similar=%d", len(res["exact"]), len(res["similar"]))
+            log.info("Reuse check done; exact=%d clusters=%d", len(exact), len(clusters))
         finally:
             self.progress.stop()
 
+    @property
+    def reuse_index(self) -> ReuseIndex:
+        """The reuse index for the current list, built on first use after a load or reset."""
+        if self._reuse_index is None:
+            self._reuse_index = ReuseIndex(self.passwords, metric=self.reuse_metric_var.get())
+        return self._reuse_index
+
+    def _reset_reuse_index(self) -> None:
+        self._reuse_index = None
+
+    def _update_reuse_index(self, change: Callable[[ReuseIndex], None]) -> None:
+        """Apply a list change to a built index; one built later reads the list as it is then."""
+        if self._reuse_index is not None:
+            change(self._reuse_index)
+
+    def _analysis_changed(self, change: Callable[[list], None]) -> None:
+        """Mirror a list change in the stored analysis, leaving touched entries stale."""
+        if self.analysis is not None:
+            change(self.analysis.entries)
+            self.analysis = self.analysis._replace(changes=self.analysis.changes + 1)
+
+    def _assess(self) -> HealthReport:
+        """Health of the current list, recomputing only what the stored analysis no longer covers."""
+        report = assess(self.passwords, self.analysis, metric=self.reuse_metric_var.get())
+        self.analysis = to_vault_analysis(report)
+        return report
+
+    def _warn_reuse(self, pwd: str) -> None:
+        """Show live reuse warnings for a password that was just added or edited."""
+        warnings = []
+        count = self.reuse_index.count(pwd)
+        if count > 1:
+            warnings.append(f"Warning: this password is now used {count} times.")
+        similar = self.reuse_index.similar_to(pwd)
+        if similar:
+            warnings.append(f"Warning: this password is similar to {len(similar)} other stored password(s):")
+            warnings.extend(f" - '{self._mask(other)}' ({sim:.2f})" for other, sim in similar)
+        if warnings:
+            self._set_results("\n".join(warnings))
+
+    def destroy(self) -> None:
+        self._lock_vault()
+        disable_analysis_cache()
+        super().destroy()
+
+    def _forget_password(self, pwd: str) -> None:
+        cache = analysis_cache()
+        if cache is not None:
+            cache.invalidate(pwd)
+
     def clear_list(self) -> None:
+        vault = self._autosave_vault()
+        if vault is not None and not messagebox.askyesno("Clear List", f"Autosave is on: this also empties {vault.path.name}. Continue?"):
+            return
         self.passwords.clear()
+        self._reset_reuse_index()
+        self.analysis = None
+        cache = analysis_cache()
+        if cache is not None:
+            cache.secure_clear()
         self.refresh_listbox()
+        self._autosave(lambda vault: vault.save([]))
         self._set_results("List cleared.")
         log.info("Cleared list")
 
@@ -283,6 +369,52 @@ class PasswordHealthAnalyzerApp(tk.Tk):
         self.strength_label.config(bg=self.colors["bg"], fg=self.colors["fg"])
         self.title_label.config(foreground=self.colors["fg"])
 
+    def _open_vault(self, path: str, overwrite: bool = False) -> VaultSession | None:
+        """Reuse the unlocked session for `path`, or ask for the master password and unlock it."""
+        if self.vault is not None and not self.vault.locked and self.vault.path == Path(path):
+            return self.vault
+        master = simpledialog.askstring("Master Password", "Enter master password:", show="*")
+        if not master:
+            return None
+        self._lock_vault()
+        self.vault = VaultSession(path, master, overwrite=overwrite)
+        return self.vault
+
+    def _autosave_vault(self) -> VaultSession | None:
+        """The open vault when autosave is on."""
+        vault = self.vault
+        if not self.autosave_var.get() or vault is None or vault.locked:
+            return None
+        return vault
+
+    def _autosave(self, change: Callable[[VaultSession], None]) -> None:
+        """Write one list change into the open vault when autosave is on.
+
+        The change is journaled only if the vault held the list as it was before the
+        change; after changes made with autosave off or a failed autosave, the journal's
+        indexes would be stale, so the whole list is saved instead.
+        """
+        synced, self._vault_synced = self._vault_synced, False
+        vault = self._autosave_vault()
+        if vault is None:
+            return
+        try:
+            if synced and vault.version == 2:
+                change(vault)
+            else:
+                vault.save(self.passwords)
+        except Exception as e:
+            messagebox.showerror("Autosave Error", str(e))
+            log.error("Autosave failed: %s", e)
+            return
+        self._vault_synced = True
+
+    def _lock_vault(self) -> None:
+        self._vault_synced = False
+        if self.vault is not None:
+            self.vault.lock()
+            self.vault = None
+
     def save_list(self) -> None:
         if not self.passwords:
             messagebox.showinfo("Empty List", "No passwords to save.")
@@ -290,11 +422,13 @@ class PasswordHealthAnalyzerApp(tk.Tk):
         path = filedialog.asksaveasfilename(defaultextension=".pha", filetypes=[("Encrypted", "*.pha"), ("All Files", "*.*")])
         if not path:
             return
-        master = simpledialog.askstring("Master Password", "Enter master password:", show="*")
-        if not master:
-            return
         try:
-            save_passwords(path, self.passwords, master)
+            vault = self._open_vault(path, overwrite=True)
+            if vault is None:
+                return
+            self._assess()
+            vault.save(self.passwords, self.analysis)
+            self._vault_synced = True
             self._set_results(f"Encrypted list saved to {path}")
             messagebox.showinfo("Saved", f"Encrypted list saved to {path}")
             log.info("Saved encrypted list to %s", path)
@@ -306,17 +440,21 @@ class PasswordHealthAnalyzerApp(tk.Tk):
         path = filedialog.askopenfilename(filetypes=[("Encrypted", "*.pha"), ("All Files", "*.*")])
         if not path:
             return
-        master = simpledialog.askstring("Master Password", "Enter master password:", show="*")
-        if not master:
-            return
         try:
-            loaded = load_passwords(path, master)
+            vault = self._open_vault(path)
+            if vault is None:
+                return
+            loaded, self.analysis = vault.load_vault()
             self.passwords = loaded
-            self._set_results(f"Loaded {len(loaded)} password(s) from encrypted file.")
+            self._vault_synced = True
+            self._reset_reuse_index()
+            report = self._assess()
+            self._set_results(f"Loaded {len(loaded)} password(s) from encrypted file.\n\n{self._health_text(report)}")
             messagebox.showinfo("Loaded", f"Encrypted list loaded from {path}")
             self.refresh_listbox()
             log.info("Loaded encrypted list from %s; count=%d", path, len(loaded))
         except Exception as e:
+            self._lock_vault()
             messagebox.showerror("Load Error", str(e))
             log.error("Load failed: %s", e)
 
@@ -332,10 +470,20 @@ class PasswordHealthAnalyzerApp(tk.Tk):
             return
         idx = sel[0]
         new = simpledialog.askstring("Edit Password", "Enter new password:", show="*")
+        if new is None:
+            return
+        new = new.strip()
         if not new:
+            messagebox.showinfo("Empty", "Enter a password to replace the selected one.")
             return
-        self.passwords[idx] = new.strip()
+        old = self.passwords[idx]
+        self._forget_password(old)
+        self.passwords[idx] = new
+        self._update_reuse_index(lambda index: index.replace(old, new))
+        self._analysis_changed(lambda entries: entries.__setitem__(idx, None))
         self.refresh_listbox()
+        self._autosave(lambda vault: vault.replace(idx, new))
+        self._warn_reuse(new)
 
     def remove_selected(self) -> None:
         sel = self.listbox.curselection()
@@ -343,8 +491,26 @@ class PasswordHealthAnalyzerApp(tk.Tk):
             messagebox.showinfo("No Selection", "Select a password to remove.")
             return
         idx = sel[0]
-        del self.passwords[idx]
+        pwd = self.passwords.pop(idx)
+        self._forget_password(pwd)
+        self._update_reuse_index(lambda index: index.remove(pwd))
+        self._analysis_changed(lambda entries: entries.pop(idx))
         self.refresh_listbox()
+        self._autosave(lambda vault: vault.remove(idx))
+
+    def _health_text(self, report: HealthReport) -> str:
+        summary = report.summary
+        restored = summary.total - report.recomputed
+        return (
+            "Health:\n"
+            f"Average strength: {summary.average_score}/10\n"
+            f"Weak (below {WEAK_SCORE}): {summary.weak}\n"
+            f"Common: {summary.common}\n"
+            f"Breached: {summary.breached}\n"
+            f"Duplicated: {summary.duplicated}\n"
+            f"Similar groups: {summary.clusters} ({summary.clustered} passwords)\n"
+            f"Restored from vault: {restored}, analyzed now: {report.recomputed}"
+        )
 
     def _mask(self, s: str) -> str:
         return "*" * len(s)
@@ -0,0 +1,98 @@
+"""Plumbing shared by the on-disk indexes and the streaming reuse counter.
+
+Index builds (`wordlist`, `breach`) and `reuse_detector.stream_exact_reuse` handle
+more records than fit in memory by spilling fixed-width records into partitions by
+a leading key byte and then processing one partition at a time:
+
+    with SpillPartitions(tmp_dir) as spill:
+        for record in records:
+            spill.add(record[0], record)
+        for data in spill.drain():
+            ...  # every record of one partition, in arrival order
+
+`fingerprint` gives both index readers the tag `strength_checker.scorer_version` records.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Iterator
+
+PARTITIONS = 256
+# Records buffered in memory, across all partitions, before they are written out.
+_BUFFER_BYTES = 8 * 1024 * 1024
+
+
+class SpillPartitions:
+    """Records spilled into temporary partition files, read back one partition at a time.
+
+    Records are buffered per partition and appended to the partition files once
+    `buffer_bytes` have accumulated, opening one file at a time, so a build never holds
+    more than one spill file open (the default descriptor limit is 256 on macOS). The
+    files live in a temporary directory, exposed as `directory` for other scratch files,
+    that is removed on `close()`.
+    """
+
+    def __init__(self, tmp_dir: str | Path | None = None, partitions: int = PARTITIONS, buffer_bytes: int = _BUFFER_BYTES) -> None:
+        self._tmp = tempfile.TemporaryDirectory(dir=tmp_dir)
+        self.directory = Path(self._tmp.name)
+        self._paths = [self.directory / f"{i:02x}.bin" for i in range(partitions)]
+        self._buffers = [bytearray() for _ in range(partitions)]
+        self._buffered = 0
+        self._limit = buffer_bytes
+
+    def __enter__(self) -> SpillPartitions:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def add(self, partition: int, record: bytes) -> None:
+        """Queue `record` for `partition`."""
+        self._buffers[partition] += record
+        self._buffered += len(record)
+        if self._buffered >= self._limit:
+            self.flush()
+
+    def flush(self) -> None:
+        """Append every buffered record to its partition file."""
+        for path, buffer in zip(self._paths, self._buffers, strict=True):
+            if buffer:
+                with open(path, "ab") as fh:
+                    fh.write(buffer)
+                buffer.clear()
+        self._buffered = 0
+
+    def drain(self) -> Iterator[bytes]:
+        """Yield each partition's records in partition order, deleting each file once read."""
+        self.flush()
+        for path in self._paths:
+            # Nothing here keeps a reference, so the caller can drop a partition before the next.
+            yield _take(path)
+
+    def close(self) -> None:
+        """Delete the spill directory and everything left in it."""
+        self._buffers = [bytearray() for _ in self._buffers]
+        self._tmp.cleanup()
+
+
+def _take(path: Path) -> bytes:
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return b""
+    path.unlink()
+    return data
+
+
+def fingerprint(header: bytes, stat: os.stat_result) -> str:
+    """Short hex tag telling index rebuilds apart in scorer tags.
+
+    Hashes the index header with the file's size and modification time, so a rebuilt
+    index gets a new tag without hashing the whole file.
+    """
+    identity = header + f"{stat.st_size}:{stat.st_mtime_ns}".encode("ascii")
+    return hashlib.blake2b(identity, digest_size=8).hexdigest()
@@ -5,31 +5,102 @@ from __future__ import annotations
 import argparse
 import logging
 import sys
-from typing import Iterable
+from collections import Counter
+from typing import Callable, Iterable, TextIO, TypeVar
 
-from gui import PasswordHealthAnalyzerApp
-from reuse_detector import detect_reuse
-from strength_checker import score_password
+import metrics
+from audit import AUDIT_FLAGS, audit_lines
+from reuse_detector import SIMILARITY_METRICS, cluster_reuse, detect_reuse, detect_reuse_within, stream_exact_reuse
+from strength_checker import SCORING_MODES, analyze_password, use_breach_index, use_dictionary
 
 log = logging.getLogger(__name__)
 
+_Number = TypeVar("_Number", int, float)
+
+
+def _at_least(convert: Callable[[str], _Number], minimum: _Number, description: str) -> Callable[[str], _Number]:
+    """Argparse type that converts a value and rejects anything below `minimum`."""
+
+    def parse(text: str) -> _Number:
+        try:
+            value = convert(text)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"expected {description}, got {text!r}") from None
+        if value < minimum:
+            raise argparse.ArgumentTypeError(f"expected {description}, got {text!r}")
+        return value
+
+    return parse
+
+
+_non_negative_int = _at_least(int, 0, "a non-negative integer")
+_positive_int = _at_least(int, 1, "a positive integer")
+_non_negative_float = _at_least(float, 0.0, "a non-negative number")
+
 
 def _build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Password Health Analyzer CLI")
     parser.add_argument("--password", "-p", help="Password to evaluate")
     parser.add_argument("--test-reuse", action="store_true", help="Run sample reuse detection")
+    parser.add_argument("--audit", metavar="FILE", help="Audit one password per line from FILE ('-' for stdin)")
+    parser.add_argument(
+        "--reuse-file", metavar="FILE", help="Count exact reuse in one password per line from FILE ('-' for stdin) in bounded memory"
+    )
+    parser.add_argument("--tmp-dir", help="Directory for --reuse-file spill files (about 24 bytes per input line)")
+    parser.add_argument(
+        "--jobs", "-j", type=_non_negative_int, default=1, help="Worker processes for --audit and reuse checks (0 = all CPUs)."
+    )
+    parser.add_argument("--chunk-size", type=_positive_int, default=2048, help="Passwords per work unit for --audit.")
+    parser.add_argument("--unordered", action="store_true", help="Emit --audit results as chunks finish, not in input order.")
     parser.add_argument(
         "--threshold",
         type=float,
         default=0.85,
         help="Similarity threshold for reuse checks (0.0 to 1.0).",
     )
+    parser.add_argument("--clusters", action="store_true", help="Report similar passwords as groups instead of pairs.")
+    parser.add_argument(
+        "--time-budget-ms",
+        type=_non_negative_float,
+        help="Stop the similarity search after this many milliseconds, checking likeliest pairs first (not with --clusters).",
+    )
+    parser.add_argument(
+        "--reuse-metric",
+        choices=SIMILARITY_METRICS,
+        default="ratio",
+        help="Similarity for reuse checks: difflib ratio, or 1 - edits / length with Levenshtein or Damerau edits.",
+    )
+    parser.add_argument("--dictionary", help="Compiled wordlist index (see wordlist.py) used for common-password checks")
+    parser.add_argument(
+        "--scoring",
+        choices=SCORING_MODES,
+        default="entropy",
+        help="Scoring mode: charset entropy heuristic or pattern-based guess estimation.",
+    )
+    parser.add_argument(
+        "--metrics-out",
+        help="Record timing metrics and write them here on exit (Prometheus text for .prom/.txt, JSON otherwise).",
+    )
+    parser.add_argument("--breach-index", help="Compiled offline breach index (see breach.py) used for breach counts")
     return parser
 
 
-def _print_reuse_result(passwords: Iterable[str], threshold: float) -> None:
+def _print_reuse_result(
+    passwords: Iterable[str],
+    threshold: float,
+    metric: str = "ratio",
+    jobs: int = 1,
+    clusters: bool = False,
+    time_budget_ms: float | None = None,
+) -> None:
     sample = list(passwords)
-    result = detect_reuse(sample, threshold)
+    heading = "Similar passwords:"
+    if time_budget_ms is not None:
+        partial = detect_reuse_within(sample, time_budget_ms, threshold, metric=metric)
+        result = {"exact": partial["exact"], "similar": partial["similar"]}
+        heading = f"Similar passwords ({partial['coverage']:.0%} of pairs checked):"
+    else:
+        result = detect_reuse(sample, threshold, metric=metric, jobs=jobs, max_similarity_pairs=0 if clusters else None)
     print(f"Sample size: {len(sample)}")
     print("Exact reuses:")
     if result["exact"]:
@@ -37,7 +108,15 @@ def _print_reuse_result(passwords: Iterable[str], threshold: float) -> None:
             print(f" - '{pwd}' used {count} times")
     else:
         print(" None")
-    print("Similar passwords:")
+    if clusters:
+        print("Similar password groups:")
+        groups = cluster_reuse(sample, threshold, metric=metric, jobs=jobs)
+        for cluster in groups:
+            print(f" - '{cluster.representative}': {', '.join(repr(m) for m in cluster.members[1:])}")
+        if not groups:
+            print(" None")
+        return
+    print(heading)
     if result["similar"]:
         for left, right, similarity in result["similar"]:
             print(f" - '{left}' ~ '{right}' ({similarity:.2f})")
@@ -45,7 +124,58 @@ def _print_reuse_result(passwords: Iterable[str], threshold: float) -> None:
         print(" None")
 
 
+def _run_audit(args: argparse.Namespace, source: TextIO) -> None:
+    started = metrics.clock()
+    scores: Counter[int] = Counter()
+    for lineno, record in audit_lines(
+        source,
+        jobs=args.jobs,
+        chunk_size=args.chunk_size,
+        ordered=not args.unordered,
+        scoring=args.scoring,
+        dictionary=args.dictionary,
+        breach_index=args.breach_index,
+    ):
+        scores[record.score] += 1
+        flags = ",".join(flag for flag in AUDIT_FLAGS if getattr(record, flag)) or "-"
+        print(f"{lineno}\t{record.score}\t{flags}\t{record.breach_count}")
+    total = sum(scores.values())
+    metrics.observe("audit", started, total)
+    summary = ", ".join(f"{score}: {scores[score]}" for score in sorted(scores))
+    print(f"Audited {total} password(s); score distribution {{{summary}}}", file=sys.stderr)
+
+
+def _run_reuse_file(args: argparse.Namespace, source: TextIO) -> None:
+    groups = reused = 0
+    for first_line, count in stream_exact_reuse(source, args.tmp_dir):
+        groups += 1
+        reused += count
+        print(f"{first_line}\t{count}")
+    print(f"{groups} reused password(s) covering {reused} line(s)", file=sys.stderr)
+
+
 def _run_cli(args: argparse.Namespace) -> bool:
+    if args.dictionary:
+        use_dictionary(args.dictionary)
+    if args.breach_index:
+        use_breach_index(args.breach_index)
+
+    if args.audit:
+        if args.audit == "-":
+            _run_audit(args, sys.stdin)
+        else:
+            with open(args.audit, encoding="utf-8", errors="replace") as source:
+                _run_audit(args, source)
+        return True
+
+    if args.reuse_file:
+        if args.reuse_file == "-":
+            _run_reuse_file(args, sys.stdin)
+        else:
+            with open(args.reuse_file, encoding="utf-8", errors="replace") as source:
+                _run_reuse_file(args, source)
+        return True
+
     if args.test_reuse:
         sample = [
             "password123",
@@ -58,12 +188,16 @@ def _run_cli(args: argparse.Namespace) -> bool:
             "hunter3",
             "password123",
         ]
-        _print_reuse_result(sample, args.threshold)
+        _print_reuse_result(sample, args.threshold, args.reuse_metric, args.jobs, args.clusters, args.time_budget_ms)
         return True
 
     if args.password is not None:
-        score = score_password(args.password)
-        print(f"Strength score: {score}/10")
+        result = analyze_password(args.password, scoring=args.scoring)
+        print(f"Strength score: {result['score']}/10")
+        if result["guesses_log10"] is not None:
+            print(f"Estimated guesses: 10^{result['guesses_log10']}")
+        if args.breach_index:
+            print(f"Seen in breaches: {result['breach_count']} times")
         return True
 
     return False
@@ -72,13 +206,24 @@ def _run_cli(args: argparse.Namespace) -> bool:
 def main(argv: list[str] | None = None) -> int:
     parser = _build_parser()
     args = parser.parse_args(argv)
-    if _run_cli(args):
+    if args.clusters and args.time_budget_ms is not None:
+        parser.error("--time-budget-ms cannot be combined with --clusters")
+    if args.metrics_out:
+        metrics.enable()
+    try:
+        if _run_cli(args):
+            return 0
+
+        # Imported here so CLI runs, and audit workers that re-import this module, never load Tkinter.
+        from gui import PasswordHealthAnalyzerApp
+
+        log.info("Launching GUI mode")
+        app = PasswordHealthAnalyzerApp()
+        app.mainloop()
         return 0
-
-    log.info("Launching GUI mode")
-    app = PasswordHealthAnalyzerApp()
-    app.mainloop()
-    return 0
+    finally:
+        if args.metrics_out:
+            metrics.write(args.metrics_out)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,115 @@
+"""Opt-in counters and timing histograms for the analyzer's core operations.
+
+Instrumentation is disabled by default. Hot paths call `clock()` before the work and
+`observe()` after it; while disabled, `clock()` returns 0.0 without reading a timer and
+`observe()` returns immediately, so the overhead is two trivial function calls.
+
+    started = metrics.clock()
+    ...
+    metrics.observe("analyze", started)
+
+Snapshots export as JSON or in the Prometheus text exposition format.
+"""
+
+from __future__ import annotations
+
+import json
+from bisect import bisect_left
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+
+# Upper bounds in seconds; the implicit last bucket is +Inf.
+BUCKETS = (0.00001, 0.0001, 0.001, 0.01, 0.1, 1.0, 10.0)
+_PREFIX = "pha"
+
+_enabled = False
+_items: dict[str, int] = {}
+_histograms: dict[str, list[Any]] = {}  # name -> [bucket counts, sum of seconds, count]
+
+
+def enable() -> None:
+    """Start recording metrics."""
+    global _enabled
+    _enabled = True
+
+
+def disable() -> None:
+    """Stop recording metrics; collected values are kept until `reset`."""
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    """Discard all collected values."""
+    _items.clear()
+    _histograms.clear()
+
+
+def clock() -> float:
+    """Return a start timestamp for `observe`, or 0.0 while disabled."""
+    return perf_counter() if _enabled else 0.0
+
+
+def observe(name: str, started: float, items: int = 1) -> None:
+    """Record one timed call of operation `name` that processed `items` inputs."""
+    if not started or not _enabled:
+        return
+    elapsed = perf_counter() - started
+    hist = _histograms.get(name)
+    if hist is None:
+        hist = _histograms[name] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+    hist[0][bisect_left(BUCKETS, elapsed)] += 1
+    hist[1] += elapsed
+    hist[2] += 1
+    _items[name] = _items.get(name, 0) + items
+
+
+def snapshot() -> dict[str, dict[str, Any]]:
+    """Return collected metrics as plain data, keyed by operation name."""
+    out: dict[str, dict[str, Any]] = {}
+    for name, (counts, total, count) in sorted(_histograms.items()):
+        cumulative = []
+        running = 0
+        for bucket_count in counts:
+            running += bucket_count
+            cumulative.append(running)
+        out[name] = {
+            "calls": count,
+            "items": _items.get(name, 0),
+            "seconds_sum": total,
+            "buckets": {**{str(bound): c for bound, c in zip(BUCKETS, cumulative, strict=False)}, "+Inf": cumulative[-1]},
+        }
+    return out
+
+
+def to_json() -> str:
+    return json.dumps(snapshot(), indent=2, sort_keys=True)
+
+
+def to_prometheus() -> str:
+    """Render metrics in the Prometheus text exposition format."""
+    lines: list[str] = []
+    for name, data in snapshot().items():
+        metric = f"{_PREFIX}_{name}"
+        lines.append(f"# HELP {metric}_seconds Duration of {name} calls.")
+        lines.append(f"# TYPE {metric}_seconds histogram")
+        for bound, count in data["buckets"].items():
+            lines.append(f'{metric}_seconds_bucket{{le="{bound}"}} {count}')
+        lines.append(f"{metric}_seconds_sum {data['seconds_sum']}")
+        lines.append(f"{metric}_seconds_count {data['calls']}")
+        lines.append(f"# HELP {metric}_items_total Inputs processed by {name}.")
+        lines.append(f"# TYPE {metric}_items_total counter")
+        lines.append(f"{metric}_items_total {data['items']}")
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def write(path: str | Path) -> None:
+    """Write metrics to `path`: Prometheus text for `.prom`/`.txt`, JSON otherwise."""
+    file_path = Path(path)
+    text = to_prometheus() if file_path.suffix in (".prom", ".txt") else to_json()
+    file_path.write_text(text, encoding="utf-8")
@@ -0,0 +1,165 @@
+"""Keyboard-walk and monotonic-sequence pattern detection."""
+
+from __future__ import annotations
+
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+from itertools import accumulate
+from typing import Iterable
+
+# Joins strings for whole-batch scans. Strings holding it or its neighbour \x01 (one step
+# away, so a run could cross the join) are scanned one at a time instead.
+_SEP = "\x00"
+_NEXT = bytes((c + 1) & 0xFF for c in range(256))
+_PREV = bytes((c - 1) & 0xFF for c in range(256))
+
+KEYBOARD_LAYOUTS: dict[str, tuple[str, ...]] = {
+    "qwerty": ("qwertyuiop", "asdfghjkl", "zxcvbnm", "1234567890"),
+    "qwertz": ("qwertzuiop", "asdfghjkl", "yxcvbnm", "1234567890"),
+    "azerty": ("azertyuiop", "qsdfghjklm", "wxcvbn", "1234567890"),
+}
+
+
+@dataclass(frozen=True)
+class PatternMatch:
+    """A detected pattern span; offsets index into the lowercased input."""
+
+    kind: str
+    start: int
+    end: int
+    token: str
+
+
+class SequenceDetector:
+    """Find keyboard walks and monotonic character runs in a single pass.
+
+    Every `k`-gram of each keyboard row, forward and reversed, is precomputed into a
+    hash table, so a keyboard hit is one dict lookup per position. Monotonic runs
+    (`abcd`, `9876`) are tracked incrementally from the previous code point.
+    """
+
+    def __init__(self, k: int = 4, rows: Iterable[str] = KEYBOARD_LAYOUTS["qwerty"]) -> None:
+        if k < 2:
+            raise ValueError("k must be at least 2")
+        self.k = k
+        self.rows = tuple(row.lower() for row in rows)
+        # k-gram -> walk id; a walk is one row in one direction.
+        self._kgrams: dict[str, int] = {}
+        for walk, seq in enumerate(seq for row in self.rows for seq in (row, row[::-1])):
+            for i in range(len(seq) - k + 1):
+                self._kgrams.setdefault(seq[i : i + k], walk)
+        self._batchable = not any(_SEP in row or "\x01" in row for row in self.rows)
+        self._kgram_re = re.compile("|".join(map(re.escape, self._kgrams))) if self._kgrams else None
+        self._run_re = re.compile(b"\x00{%d}" % (k - 1))
+
+    def flags(self, s: str) -> tuple[bool, bool]:
+        """Return `(sequence, keyboard)` flags, stopping as soon as both are found."""
+        low = s.lower()
+        k = self.k
+        kgrams = self._kgrams
+        sequence = keyboard = False
+        run = 0
+        direction = 0
+        prev = 0
+        for i, ch in enumerate(low):
+            code = ord(ch)
+            step = code - prev
+            if i and (step == 1 or step == -1):
+                if step == direction:
+                    run += 1
+                else:
+                    run = 2
+                    direction = step
+            else:
+                run = 1
+                direction = 0
+            prev = code
+            if run >= k:
+                sequence = True
+            if not keyboard and i >= k - 1 and low[i - k + 1 : i + 1] in kgrams:
+                keyboard = True
+            if sequence and keyboard:
+                break
+        return sequence, keyboard
+
+    def flags_many(self, strings: list[str]) -> list[tuple[bool, bool]]:
+        """`flags` for each string, scanning ASCII strings in whole-batch passes.
+
+        The batch is joined into one string; keyboard walks are one regex search over
+        it, and monotonic runs are runs of zero bytes in the XOR of the text shifted by
+        one character against the text with every byte stepped up (or down) by one.
+        Hits are mapped back to their string by offset.
+        """
+        result = [(False, False)] * len(strings)
+        batch: list[int] = []
+        for i, s in enumerate(strings):
+            if self._batchable and s.isascii() and _SEP not in s and "\x01" not in s:
+                batch.append(i)
+            else:
+                result[i] = self.flags(s)
+        if not batch:
+            return result
+        text = _SEP.join(strings[i] for i in batch).lower()
+        # ends[j] is the offset of the separator after batch string j.
+        ends = [end - 1 for end in accumulate(len(strings[i]) + 1 for i in batch)]
+        sequence = [False] * len(batch)
+        keyboard = [False] * len(batch)
+        data = text.encode("ascii")
+        if len(data) > 1:
+            following = int.from_bytes(data[1:], "big")
+            for table in (_NEXT, _PREV):
+                stepped = int.from_bytes(data[:-1].translate(table), "big")
+                diff = (following ^ stepped).to_bytes(len(data) - 1, "big")
+                for match in self._run_re.finditer(diff):
+                    sequence[bisect_right(ends, match.start())] = True
+        if self._kgram_re is not None:
+            for match in self._kgram_re.finditer(text):
+                keyboard[bisect_right(ends, match.start())] = True
+        for j, i in enumerate(batch):
+            result[i] = (sequence[j], keyboard[j])
+        return result
+
+    def find(self, s: str) -> list[PatternMatch]:
+        """Return every maximal keyboard and sequence span, ordered by start offset."""
+        low = s.lower()
+        k = self.k
+        kgrams = self._kgrams
+        matches: list[PatternMatch] = []
+
+        run_start = 0
+        direction = 0
+        prev = 0
+        walk_id = -1
+        walk_start = walk_end = 0
+        for i, ch in enumerate(low):
+            code = ord(ch)
+            step = code - prev
+            prev = code
+            if not (i and (step == 1 or step == -1) and step == direction):
+                if i - run_start >= k:
+                    matches.append(PatternMatch("sequence", run_start, i, low[run_start:i]))
+                if i and (step == 1 or step == -1):
+                    run_start = i - 1
+                    direction = step
+                else:
+                    run_start = i
+                    direction = 0
+
+            if i >= k - 1:
+                start = i - k + 1
+                hit = kgrams.get(low[start : i + 1], -1)
+                if hit >= 0 and hit == walk_id and start == walk_end - k + 1:
+                    walk_end = i + 1
+                    continue
+                if walk_id >= 0:
+                    matches.append(PatternMatch("keyboard", walk_start, walk_end, low[walk_start:walk_end]))
+                walk_id = hit
+                walk_start, walk_end = start, i + 1
+
+        if len(low) - run_start >= k:
+            matches.append(PatternMatch("sequence", run_start, len(low), low[run_start:]))
+        if walk_id >= 0:
+            matches.append(PatternMatch("keyboard", walk_start, walk_end, low[walk_start:walk_end]))
+        matches.sort(key=lambda m: (m.start, m.end))
+        return matches
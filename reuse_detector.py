@@ -2,13 +2,46 @@
 
 from __future__ import annotations
 
+import hashlib
 import logging
+import math
+import os
+import secrets
+import struct
+from array import array
+from bisect import bisect_left
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from difflib import SequenceMatcher
-from typing import TypedDict
+from functools import partial
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Iterable, Iterator, NamedTuple, TypedDict
+
+import metrics
+from edit_distance import damerau_levenshtein, levenshtein, pattern_masks
+from indexfile import SpillPartitions
 
 log = logging.getLogger(__name__)
 
+ENGINES = ("indexed", "pairwise")
+# `ratio` is difflib's 2*M/T; the edit metrics score 1 - distance / max(len(a), len(b)).
+SIMILARITY_METRICS = ("ratio", "levenshtein", "damerau")
+_EDIT_DISTANCES = {"levenshtein": levenshtein, "damerau": damerau_levenshtein}
+# Bigrams one edit can destroy: two for insert/delete/substitute, three for a transposition.
+_BIGRAMS_PER_EDIT = {"levenshtein": 2, "damerau": 3}
+# Row blocks per worker for parallel runs; more blocks even out uneven rows.
+_BLOCKS_PER_JOB = 8
+_STREAM_DIGEST_BYTES = 16
+_STREAM_SPILL = struct.Struct(f">{_STREAM_DIGEST_BYTES}sQ")  # keyed digest, line number
+# Cheap upper bounds on the SequenceMatcher ratio, tried in order before the full computation.
+FILTER_STAGES = ("length", "histogram")
+# Neighbour distances in suffix order tried by the anytime search; prefix order runs to completion.
+_SUFFIX_WINDOW = 8
+# Pairs scored between deadline checks in the anytime search.
+_DEADLINE_STRIDE = 256
+
 
 class ReuseResult(TypedDict):
     """Structured result for reuse detection."""
@@ -17,37 +50,858 @@ class ReuseResult(TypedDict):
     similar: list[tuple[str, str, float]]
 
 
+class PartialReuseResult(ReuseResult):
+    """Reuse result of a time-budgeted search; `coverage` is the fraction of pairs checked."""
+
+    coverage: float
+    complete: bool
+
+
+class ReuseCluster(NamedTuple):
+    """Passwords connected by a chain of similar pairs; `representative` is the first seen."""
+
+    representative: str
+    members: tuple[str, ...]
+
+
+class ExactReuse(NamedTuple):
+    """A password seen more than once: its first 1-based position (line) and how often."""
+
+    line: int
+    count: int
+
+
+def _max_edits(longest: int, threshold: float) -> int:
+    """Largest edit distance `d` with `1 - d / longest >= threshold`, using the scoring arithmetic."""
+    d = min(max(int((1.0 - threshold) * longest), 0), longest)
+    while d > 0 and 1.0 - d / longest < threshold:
+        d -= 1
+    while d < longest and 1.0 - (d + 1) / longest >= threshold:
+        d += 1
+    return d
+
+
+def _length_window(length: int, threshold: float, metric: str = "ratio") -> tuple[int, float]:
+    """Partner lengths for which the metric's length bound can still reach `threshold`."""
+    if threshold <= 0.0:
+        return 1, math.inf
+    if metric == "ratio":
+        # 2 * min / (la + lb)
+        lo = math.ceil(threshold * length / (2.0 - threshold) - 1e-9)
+        hi = math.floor(length * (2.0 - threshold) / threshold + 1e-9)
+    else:
+        # min / max
+        lo = math.ceil(threshold * length - 1e-9)
+        hi = math.floor(length / threshold + 1e-9)
+    return max(lo, 1), hi
+
+
+def _min_shared_bigrams(la: int, lb: int, threshold: float, metric: str = "ratio") -> int:
+    """Lower bound on shared bigram occurrences for a similarity >= `threshold`.
+
+    For `ratio`: with M matched characters in B matching blocks, the blocks contribute
+    at least M - B shared bigrams. Blocks are separated by unmatched characters, so
+    B <= (la - M) + (lb - M) + 1, giving shared >= 3M - (la + lb) - 1. For the edit
+    metrics this is the q-gram lemma: max(la, lb) - 1 bigrams minus those k edits destroy.
+    """
+    if metric != "ratio":
+        longest = max(la, lb)
+        return longest - 1 - _BIGRAMS_PER_EDIT[metric] * _max_edits(longest, threshold)
+    total = la + lb
+    matched = math.ceil(threshold * total / 2.0 - 1e-9)
+    return 3 * matched - total - 1
+
+
+def _bigram_tokens(s: str) -> list[tuple[str, int]]:
+    """Bigrams tagged with their occurrence number, so set overlap equals multiset overlap."""
+    seen: Counter[str] = Counter()
+    tokens = []
+    for i in range(len(s) - 1):
+        gram = s[i : i + 2]
+        seen[gram] += 1
+        tokens.append((gram, seen[gram]))
+    return tokens
+
+
+class _DisjointSet:
+    """Union-find over ids `0..n-1` with union by size and path halving."""
+
+    def __init__(self, n: int = 0) -> None:
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def add(self) -> int:
+        self.parent.append(len(self.parent))
+        self.size.append(1)
+        return len(self.parent) - 1
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> None:
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+
+    def groups(self, ids: Iterable[int]) -> list[list[int]]:
+        """Groups of two or more `ids`, each ascending, ordered by their smallest id."""
+        groups: dict[int, list[int]] = {}
+        for i in sorted(ids):
+            groups.setdefault(self.find(i), []).append(i)
+        return [members for members in groups.values() if len(members) > 1]
+
+
+class _PairScorer:
+    """Scores pairs with the selected metric after cheaper upper bounds reject hopeless ones.
+
+    For `ratio` the length bound is `real_quick_ratio` and the histogram bound is
+    `quick_ratio`, both computed from per-string data prepared once instead of per
+    pair. `SequenceMatcher.ratio()` depends on which string comes first, so a pair
+    scores the better of its two orientations; the score then does not depend on the
+    order strings arrive in (`ReuseIndex` edits reorder them). For the edit metrics the distance is at least the length difference and at
+    least `max(la, lb)` minus the shared characters, and the bit-parallel distance
+    stops as soon as it exceeds the largest distance the threshold allows. Every
+    bound is at least the true similarity, so rejected pairs could never reach the threshold.
+    """
+
+    def __init__(self, strings: list[str], threshold: float, stats: dict[str, int], metric: str = "ratio") -> None:
+        self.strings = strings
+        self.threshold = threshold
+        self.stats = stats
+        self.metric = metric
+        self.histograms = [Counter(s) for s in strings]
+        self.matcher = SequenceMatcher(None)
+        self.reverse = SequenceMatcher(None)
+        self.row = -1
+        self.masks: dict[str, int] = {}
+        self.max_edits: dict[int, int] = {}
+
+    def append(self, s: str) -> int:
+        """Register another string and return its id."""
+        self.strings.append(s)
+        self.histograms.append(Counter(s))
+        return len(self.strings) - 1
+
+    def discard(self, i: int) -> None:
+        """Drop the data held for string `i`; its id must not be scored again."""
+        self.strings[i] = ""
+        self.histograms[i] = Counter()
+        if self.row == i:
+            self.row = -1
+
+    def _shared(self, i: int, j: int) -> int:
+        ha, hb = self.histograms[i], self.histograms[j]
+        if len(ha) > len(hb):
+            ha, hb = hb, ha
+        return sum(min(count, hb[ch]) for ch, count in ha.items() if ch in hb)
+
+    def score(self, i: int, j: int) -> float | None:
+        """Return the similarity of strings `i` and `j`, or None when it is below the threshold."""
+        if self.metric != "ratio":
+            return self._edit_score(i, j)
+        stats = self.stats
+        stats["pairs"] += 1
+        a, b = self.strings[i], self.strings[j]
+        total = len(a) + len(b)
+        # Same arithmetic as SequenceMatcher so the bounds and the final ratio compare identically.
+        if 2.0 * min(len(a), len(b)) / total < self.threshold:
+            stats["length"] += 1
+            return None
+        bound = 2.0 * self._shared(i, j) / total
+        if bound < self.threshold:
+            stats["histogram"] += 1
+            return None
+        if self.row != j:
+            # SequenceMatcher caches analysis of seq2, so keep the row string there.
+            self.matcher.set_seq2(b)
+            self.row = j
+        self.matcher.set_seq1(a)
+        stats["scored"] += 1
+        ratio = self.matcher.ratio()
+        if ratio < bound:
+            # Only a ratio short of the histogram bound can improve the other way round.
+            self.reverse.set_seqs(b, a)
+            ratio = max(ratio, self.reverse.ratio())
+        return ratio if ratio >= self.threshold else None
+
+    def _edit_score(self, i: int, j: int) -> float | None:
+        stats = self.stats
+        stats["pairs"] += 1
+        a, b = self.strings[i], self.strings[j]
+        longest = max(len(a), len(b))
+        limit = self.max_edits.get(longest)
+        if limit is None:
+            limit = self.max_edits[longest] = _max_edits(longest, self.threshold)
+        if longest - min(len(a), len(b)) > limit:
+            stats["length"] += 1
+            return None
+        if longest - self._shared(i, j) > limit:
+            stats["histogram"] += 1
+            return None
+        if self.row != j:
+            # Both distances are symmetric, so the row string is the bit-vector pattern.
+            self.masks = pattern_masks(b)
+            self.row = j
+        stats["scored"] += 1
+        distance = _EDIT_DISTANCES[self.metric](b, a, limit, self.masks)
+        return None if distance is None else 1.0 - distance / longest
+
+
+class _CandidateIndex:
+    """Prefix-filtered bigram index proposing only pairs that can reach the threshold.
+
+    Each string's tagged bigrams are ordered rarest-first across the whole input.
+    Two strings sharing at least `t` bigrams must share one within their first
+    `len - t + 1` tokens, so only those prefixes are indexed and probed. Pairs whose
+    lengths are too short for the bigram bound to apply are always proposed, which
+    keeps the engine exact: every pair the all-pairs scan would report is a candidate.
+    """
+
+    def __init__(self, strings: list[str], threshold: float, metric: str = "ratio") -> None:
+        self.strings = strings
+        self.threshold = threshold
+        self.metric = metric
+        tagged = [_bigram_tokens(s) for s in strings]
+        frequency = Counter(token for tokens in tagged for token in tokens)
+        order = {token: rank for rank, (token, _) in enumerate(sorted(frequency.items(), key=lambda kv: (kv[1], kv[0])))}
+
+        self.by_length: dict[int, list[int]] = {}
+        for i, s in enumerate(strings):
+            self.by_length.setdefault(len(s), []).append(i)
+        self.lengths = sorted(self.by_length)
+        # length -> (partner lengths whose bound is vacuous, smallest positive bound over the window)
+        self._plans: dict[int, tuple[list[int], int]] = {}
+
+        self.tokens: list[frozenset[int]] = []
+        self.prefixes: list[list[int]] = []
+        self.postings: dict[int, list[int]] = {}
+        for i, s in enumerate(strings):
+            ranked = sorted(order[token] for token in tagged[i])
+            required = self._plan(len(s))[1]
+            prefix = ranked[: max(len(ranked) - required + 1, 0)]
+            self.tokens.append(frozenset(ranked))
+            self.prefixes.append(prefix)
+            for token in prefix:
+                self.postings.setdefault(token, []).append(i)
+
+    def _plan(self, la: int) -> tuple[list[int], int]:
+        plan = self._plans.get(la)
+        if plan is None:
+            lo, hi = _length_window(la, self.threshold, self.metric)
+            window = [lb for lb in self.lengths[bisect_left(self.lengths, lo) :] if lb <= hi]
+            needs = [_min_shared_bigrams(la, lb, self.threshold, self.metric) for lb in window]
+            vacuous = [lb for lb, need in zip(window, needs, strict=True) if need <= 0]
+            plan = self._plans[la] = (vacuous, max(min(needs, default=1), 1))
+        return plan
+
+    def earlier(self, j: int) -> list[int]:
+        """Return candidate partners `i < j` for string `j`, ascending."""
+        s = self.strings[j]
+        la = len(s)
+        lo, hi = _length_window(la, self.threshold, self.metric)
+        found: set[int] = set()
+
+        # Where the bigram bound is vacuous, every length-compatible string is a candidate.
+        for lb in self._plan(la)[0]:
+            bucket = self.by_length[lb]
+            found.update(bucket[: bisect_left(bucket, j)])
+
+        tokens = self.tokens[j]
+        for token in self.prefixes[j]:
+            ids = self.postings.get(token)
+            if not ids:
+                continue
+            for i in ids[: bisect_left(ids, j)]:
+                if i in found:
+                    continue
+                lb = len(self.strings[i])
+                if lo <= lb <= hi and len(tokens & self.tokens[i]) >= _min_shared_bigrams(la, lb, self.threshold, self.metric):
+                    found.add(i)
+        return sorted(found)
+
+
 def detect_reuse(
     passwords: list[str],
     similarity_threshold: float = 0.85,
-    max_similarity_pairs: int = 5000,
+    max_similarity_pairs: int | None = None,
+    engine: str = "indexed",
+    stats: dict[str, int] | None = None,
+    metric: str = "ratio",
+    jobs: int = 1,
 ) -> ReuseResult:
-    """Find exact and near-duplicate passwords in a list."""
+    """Find exact and near-duplicate passwords in a list.
+
+    The default `indexed` engine only scores candidate pairs proposed by a bigram
+    index and reports the same pairs as the exhaustive `pairwise` engine.
+    `max_similarity_pairs` optionally caps the number of pairs considered;
+    `None` means unlimited.
+
+    `metric` selects the similarity: `ratio` (difflib), or `levenshtein` / `damerau`,
+    which score `1 - edits / max(len(a), len(b))` using bit-parallel edit distance.
+
+    Pass a dict as `stats` to receive counters: `pairs` considered, rejections per
+    stage in `FILTER_STAGES`, and `scored` full ratio computations.
+
+    `jobs` > 1 spreads the similarity search over that many worker processes
+    (`jobs=0` uses every CPU) with identical output; runs with a
+    `max_similarity_pairs` budget stay serial so the budget applies in order.
+    """
     if not 0.0 <= similarity_threshold <= 1.0:
         raise ValueError("similarity_threshold must be between 0.0 and 1.0")
-    if max_similarity_pairs < 0:
+    if max_similarity_pairs is not None and max_similarity_pairs < 0:
         raise ValueError("max_similarity_pairs must be non-negative")
+    if engine not in ENGINES:
+        raise ValueError(f"engine must be one of {', '.join(ENGINES)}")
+    if metric not in SIMILARITY_METRICS:
+        raise ValueError(f"metric must be one of {', '.join(SIMILARITY_METRICS)}")
+    if jobs < 0:
+        raise ValueError("jobs must be non-negative")
+    jobs = jobs or os.cpu_count() or 1
 
+    started = metrics.clock()
     counts = Counter(p for p in passwords if p)
     exact = {password: count for password, count in counts.items() if count > 1}
     uniq = list(counts.keys())
     n = len(uniq)
 
+    counters = dict.fromkeys(("pairs", *FILTER_STAGES, "scored"), 0)
+    similar: list[tuple[str, str, float]] = []
+    pair_budget = max_similarity_pairs if max_similarity_pairs is not None else math.inf
+    if n > 1 and jobs > 1 and max_similarity_pairs is None:
+        similar = _parallel_similar(uniq, similarity_threshold, metric, engine, jobs, counters)
+    elif n > 1 and pair_budget > 0:
+        scorer = _PairScorer(uniq, similarity_threshold, counters, metric)
+        if engine == "pairwise":
+            similar = _pairwise_similar(uniq, scorer, pair_budget)
+        else:
+            similar = _indexed_similar(uniq, scorer, pair_budget)
+    if stats is not None:
+        stats.update(counters)
+    metrics.observe("reuse", started, len(passwords))
+    log.debug(
+        "reuse_detect: inputs=%d uniq=%d exact=%d similar=%d filters=%s", len(passwords), n, len(exact), len(similar), counters
+    )
+    return {"exact": exact, "similar": similar}
+
+
+def detect_reuse_within(
+    passwords: list[str],
+    time_budget_ms: float,
+    similarity_threshold: float = 0.85,
+    metric: str = "ratio",
+    stats: dict[str, int] | None = None,
+) -> PartialReuseResult:
+    """Find exact and near-duplicate passwords, stopping after `time_budget_ms`.
+
+    Exact counts are always complete. Similar pairs are checked likeliest first
+    (neighbours in prefix and suffix order), so a short budget still finds most
+    near-duplicates whatever the input order. `coverage` is the fraction of all
+    unique pairs checked before the deadline and `complete` tells whether every
+    pair was; a complete result reports the same pairs as `detect_reuse`.
+    `stats` receives the same counters as in `detect_reuse`.
+    """
+    if not 0.0 <= similarity_threshold <= 1.0:
+        raise ValueError("similarity_threshold must be between 0.0 and 1.0")
+    if time_budget_ms < 0:
+        raise ValueError("time_budget_ms must be non-negative")
+    if metric not in SIMILARITY_METRICS:
+        raise ValueError(f"metric must be one of {', '.join(SIMILARITY_METRICS)}")
+
+    deadline = perf_counter() + time_budget_ms / 1000.0
+    started = metrics.clock()
+    counts = Counter(p for p in passwords if p)
+    exact = {password: count for password, count in counts.items() if count > 1}
+    uniq = list(counts.keys())
+    total = len(uniq) * (len(uniq) - 1) // 2
+
+    counters = dict.fromkeys(("pairs", *FILTER_STAGES, "scored"), 0)
+    scorer = _PairScorer(uniq, similarity_threshold, counters, metric)
+    found: list[tuple[int, int, float]] = []
+    checked = 0
+    for i, j in _prioritized_pairs(uniq):
+        if checked % _DEADLINE_STRIDE == 0 and perf_counter() >= deadline:
+            break
+        s = scorer.score(i, j)
+        if s is not None:
+            found.append((i, j, s))
+        checked += 1
+    found.sort()
+    if stats is not None:
+        stats.update(counters)
+    metrics.observe("reuse_anytime", started, len(passwords))
+    log.debug("reuse_anytime: uniq=%d checked=%d of %d similar=%d", len(uniq), checked, total, len(found))
+    return {
+        "exact": exact,
+        "similar": [(uniq[i], uniq[j], s) for i, j, s in found],
+        "coverage": checked / total if total else 1.0,
+        "complete": checked == total,
+    }
+
+
+def _neighbour_pairs(order: list[int], width: int) -> Iterator[tuple[int, int]]:
+    """Pairs `width` apart in `order`, as `(smaller id, larger id)`."""
+    for k in range(len(order) - width):
+        a, b = order[k], order[k + width]
+        yield (a, b) if a < b else (b, a)
+
+
+def _prioritized_pairs(uniq: list[str]) -> Iterator[tuple[int, int]]:
+    """Every pair of ids once, likeliest near-duplicates first.
+
+    Strings are sorted forwards (shared prefixes) and by their reversal (shared
+    suffixes); pass `w` yields the pairs `w` apart in each order, so neighbours come
+    long before unrelated strings. Suffix passes stop after `_SUFFIX_WINDOW`, which
+    bounds how many pairs are remembered for the prefix passes to skip later.
+    The order depends only on the strings, not on their input positions.
+    """
+    by_prefix = sorted(range(len(uniq)), key=uniq.__getitem__)
+    by_suffix = sorted(range(len(uniq)), key=lambda i: uniq[i][::-1])
+    rank = [0] * len(uniq)
+    for position, i in enumerate(by_prefix):
+        rank[i] = position
+    ahead: set[tuple[int, int]] = set()
+    for width in range(1, len(uniq)):
+        for pair in _neighbour_pairs(by_prefix, width):
+            if ahead and pair in ahead:
+                ahead.discard(pair)
+            else:
+                yield pair
+        if width > _SUFFIX_WINDOW:
+            continue
+        for pair in _neighbour_pairs(by_suffix, width):
+            # Pairs at most `width` apart in prefix order were yielded already.
+            if abs(rank[pair[0]] - rank[pair[1]]) > width:
+                ahead.add(pair)
+                yield pair
+
+
+class ReuseIndex:
+    """Reuse state for a mutable password list, updated one entry at a time.
+
+    Exact counts and near-duplicate pairs are kept current on `add`, `remove` and
+    `replace`, so each change only scores the new entry against the candidates that
+    share enough bigrams with it (the same bounds `detect_reuse` uses), instead of
+    rescanning the list. Built by adding a list in order, `result()` equals
+    `detect_reuse(list, threshold, metric=metric)`.
+    """
+
+    def __init__(self, passwords: Iterable[str] = (), similarity_threshold: float = 0.85, metric: str = "ratio") -> None:
+        if not 0.0 <= similarity_threshold <= 1.0:
+            raise ValueError("similarity_threshold must be between 0.0 and 1.0")
+        if metric not in SIMILARITY_METRICS:
+            raise ValueError(f"metric must be one of {', '.join(SIMILARITY_METRICS)}")
+        self.threshold = similarity_threshold
+        self.metric = metric
+        self.clear()
+        for pwd in passwords:
+            self.add(pwd)
+
+    def __len__(self) -> int:
+        return self._counts.total()
+
+    def __contains__(self, pwd: object) -> bool:
+        return pwd in self._counts
+
+    def count(self, pwd: str) -> int:
+        return self._counts[pwd]
+
+    def add(self, pwd: str) -> None:
+        """Add one occurrence of `pwd`; empty strings are ignored like in `detect_reuse`."""
+        if not pwd:
+            return
+        self._counts[pwd] += 1
+        if self._counts[pwd] == 1:
+            self._insert(pwd)
+
+    def remove(self, pwd: str) -> None:
+        """Remove one occurrence of `pwd`; raises KeyError if it is not present."""
+        if not pwd:
+            return
+        if pwd not in self._counts:
+            raise KeyError(pwd)
+        self._counts[pwd] -= 1
+        if not self._counts[pwd]:
+            del self._counts[pwd]
+            self._delete(self._ids.pop(pwd))
+
+    def replace(self, old: str, new: str) -> None:
+        """Replace one occurrence of `old` with `new`, e.g. after an edit."""
+        self.remove(old)
+        self.add(new)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        self._counts: Counter[str] = Counter()
+        self._ids: dict[str, int] = {}
+        self._scorer = _PairScorer([], self.threshold, dict.fromkeys(("pairs", *FILTER_STAGES, "scored"), 0), self.metric)
+        self._tokens: dict[int, list[tuple[str, int]]] = {}
+        self._postings: dict[tuple[str, int], set[int]] = {}
+        self._by_length: dict[int, set[int]] = {}
+        self._pairs: dict[int, dict[int, float]] = {}
+
+    def clusters(self) -> list[ReuseCluster]:
+        """Current near-duplicate families; see `cluster_reuse`."""
+        live = sorted(self._pairs)
+        position = {i: k for k, i in enumerate(live)}
+        sets = _DisjointSet(len(live))
+        for i, partners in self._pairs.items():
+            for j in partners:
+                if i < j:
+                    sets.union(position[i], position[j])
+        strings = self._scorer.strings
+        return [ReuseCluster(strings[live[g[0]]], tuple(strings[live[k]] for k in g)) for g in sets.groups(range(len(live)))]
+
+    def similar_to(self, pwd: str) -> list[tuple[str, float]]:
+        """Other passwords in the index similar to `pwd`, which must be present."""
+        i = self._ids.get(pwd)
+        if i is None:
+            return []
+        strings = self._scorer.strings
+        return [(strings[other], score) for other, score in sorted(self._pairs[i].items())]
+
+    def exact(self) -> dict[str, int]:
+        """Passwords present more than once, with their counts."""
+        return {pwd: self._counts[pwd] for pwd in self._ids if self._counts[pwd] > 1}
+
+    def result(self) -> ReuseResult:
+        """Current reuse state in the `detect_reuse` shape; pairs are in insertion order."""
+        exact = self.exact()
+        strings = self._scorer.strings
+        similar = [(strings[i], strings[j], self._pairs[i][j]) for i in sorted(self._pairs) for j in sorted(self._pairs[i]) if i < j]
+        return {"exact": exact, "similar": similar}
+
+    def _insert(self, pwd: str) -> None:
+        j = self._scorer.append(pwd)
+        self._ids[pwd] = j
+        self._pairs[j] = {}
+        la = len(pwd)
+        lo, hi = _length_window(la, self.threshold, self.metric)
+        strings = self._scorer.strings
+
+        shared: Counter[int] = Counter()
+        tokens = _bigram_tokens(pwd)
+        for token in tokens:
+            shared.update(self._postings.get(token, ()))
+        candidates = {
+            i
+            for i, count in shared.items()
+            if lo <= len(strings[i]) <= hi and count >= _min_shared_bigrams(la, len(strings[i]), self.threshold, self.metric)
+        }
+        for lb, ids in self._by_length.items():
+            if lo <= lb <= hi and _min_shared_bigrams(la, lb, self.threshold, self.metric) <= 0:
+                candidates.update(ids)
+
+        for i in sorted(candidates):
+            score = self._scorer.score(i, j)
+            if score is not None:
+                self._pairs[i][j] = score
+                self._pairs[j][i] = score
+
+        self._tokens[j] = tokens
+        for token in tokens:
+            self._postings.setdefault(token, set()).add(j)
+        self._by_length.setdefault(la, set()).add(j)
+
+    def _delete(self, i: int) -> None:
+        for token in self._tokens.pop(i):
+            ids = self._postings[token]
+            ids.discard(i)
+            if not ids:
+                del self._postings[token]
+        length = len(self._scorer.strings[i])
+        self._by_length[length].discard(i)
+        if not self._by_length[length]:
+            del self._by_length[length]
+        for other in self._pairs.pop(i):
+            del self._pairs[other][i]
+        self._scorer.discard(i)
+
+
+def cluster_reuse(
+    passwords: list[str],
+    similarity_threshold: float = 0.85,
+    engine: str = "indexed",
+    metric: str = "ratio",
+    jobs: int = 1,
+) -> list[ReuseCluster]:
+    """Group transitively similar passwords instead of listing every similar pair.
+
+    A family of k variants yields one `ReuseCluster` of k members rather than up to
+    k * (k - 1) / 2 pairs. Clusters are the connected components of the pair graph
+    `detect_reuse` would report, ordered by first appearance. Serially, a candidate
+    pair already joined through other pairs is not scored at all.
+    """
+    if not 0.0 <= similarity_threshold <= 1.0:
+        raise ValueError("similarity_threshold must be between 0.0 and 1.0")
+    if engine not in ENGINES:
+        raise ValueError(f"engine must be one of {', '.join(ENGINES)}")
+    if metric not in SIMILARITY_METRICS:
+        raise ValueError(f"metric must be one of {', '.join(SIMILARITY_METRICS)}")
+    if jobs < 0:
+        raise ValueError("jobs must be non-negative")
+
+    started = metrics.clock()
+    uniq = list(dict.fromkeys(p for p in passwords if p))
+    n = len(uniq)
+    sets = _DisjointSet(n)
+    if n > 1 and (jobs or os.cpu_count() or 1) > 1:
+        ids = {pwd: i for i, pwd in enumerate(uniq)}
+        for a, b, _ in detect_reuse(uniq, similarity_threshold, engine=engine, metric=metric, jobs=jobs)["similar"]:
+            sets.union(ids[a], ids[b])
+    elif n > 1:
+        scorer = _PairScorer(uniq, similarity_threshold, dict.fromkeys(("pairs", *FILTER_STAGES, "scored"), 0), metric)
+        index = _CandidateIndex(uniq, similarity_threshold, metric) if engine == "indexed" else None
+        for row in range(n):
+            if index is not None:
+                pairs: Iterable[tuple[int, int]] = ((i, row) for i in index.earlier(row))
+            else:
+                pairs = ((row, j) for j in range(row + 1, n))
+            for i, j in pairs:
+                if sets.find(i) != sets.find(j) and scorer.score(i, j) is not None:
+                    sets.union(i, j)
+    clusters = [ReuseCluster(uniq[g[0]], tuple(uniq[i] for i in g)) for g in sets.groups(range(n))]
+    metrics.observe("reuse_cluster", started, len(passwords))
+    return clusters
+
+
+def _pairwise_similar(uniq: list[str], scorer: _PairScorer, pair_budget: float) -> list[tuple[str, str, float]]:
     similar: list[tuple[str, str, float]] = []
-    pair_budget = max_similarity_pairs
-    if n > 1 and pair_budget > 0:
-        # Limit O(n^2) similarity checks; exact duplicate counting is already O(n).
-        for i in range(n):
+    for i in range(len(uniq)):
+        for j in range(i + 1, len(uniq)):
+            if pair_budget <= 0:
+                return similar
+            s = scorer.score(i, j)
+            if s is not None:
+                similar.append((uniq[i], uniq[j], s))
+            pair_budget -= 1
+    return similar
+
+
+def _indexed_similar(uniq: list[str], scorer: _PairScorer, pair_budget: float) -> list[tuple[str, str, float]]:
+    index = _CandidateIndex(uniq, scorer.threshold, scorer.metric)
+    found: list[tuple[int, int, float]] = []
+    for j in range(1, len(uniq)):
+        for i in index.earlier(j):
             if pair_budget <= 0:
                 break
-            for j in range(i + 1, n):
-                if pair_budget <= 0:
-                    break
-                a, b = uniq[i], uniq[j]
-                s = SequenceMatcher(None, a, b).ratio()
-                if s >= similarity_threshold:
-                    similar.append((a, b, s))
-                pair_budget -= 1
-    log.info("reuse_detect: inputs=%d uniq=%d exact=%d similar=%d", len(passwords), n, len(exact), len(similar))
-    return {"exact": exact, "similar": similar}
+            s = scorer.score(i, j)
+            if s is not None:
+                found.append((i, j, s))
+            pair_budget -= 1
+        if pair_budget <= 0:
+            break
+    found.sort()
+    return [(uniq[i], uniq[j], s) for i, j, s in found]
+
+
+# Per-worker state for parallel runs: the unique strings, their candidate index and a scorer.
+_shard_strings: list[str] = []
+_shard_index: _CandidateIndex | None = None
+_shard_scorer: _PairScorer | None = None
+
+
+def _share_strings(strings: list[str]) -> tuple[SharedMemory, int]:
+    """Copy `strings` into one shared memory block: UTF-8 byte lengths, then the bytes."""
+    encoded = [s.encode("utf-8") for s in strings]
+    header = array("I", (len(b) for b in encoded)).tobytes()
+    payload = header + b"".join(encoded)
+    shm = SharedMemory(create=True, size=max(len(payload), 1))
+    shm.buf[: len(payload)] = payload
+    return shm, len(payload)
+
+
+def _init_shard_worker(name: str, size: int, count: int, threshold: float, metric: str, engine: str) -> None:
+    global _shard_strings, _shard_index, _shard_scorer
+    shm = SharedMemory(name=name)
+    try:
+        raw = bytes(shm.buf[:size])
+    finally:
+        shm.close()
+    lengths = array("I")
+    lengths.frombytes(raw[: lengths.itemsize * count])
+    offset = lengths.itemsize * count
+    strings = []
+    for length in lengths:
+        strings.append(raw[offset : offset + length].decode("utf-8"))
+        offset += length
+    _shard_strings = strings
+    _shard_scorer = _PairScorer(strings, threshold, dict.fromkeys(("pairs", *FILTER_STAGES, "scored"), 0), metric)
+    _shard_index = _CandidateIndex(strings, threshold, metric) if engine == "indexed" else None
+
+
+def _similar_shard(start: int, stop: int) -> tuple[list[tuple[int, int, float]], dict[str, int]]:
+    """Score rows `start:stop`: partners `i < j` of row `j` (indexed), or `j > i` of row `i` (pairwise)."""
+    assert _shard_scorer is not None
+    scorer = _shard_scorer
+    scorer.stats = dict.fromkeys(scorer.stats, 0)
+    found: list[tuple[int, int, float]] = []
+    for row in range(start, stop):
+        if _shard_index is not None:
+            pairs = ((i, row) for i in _shard_index.earlier(row))
+        else:
+            pairs = ((row, j) for j in range(row + 1, len(_shard_strings)))
+        for i, j in pairs:
+            s = scorer.score(i, j)
+            if s is not None:
+                found.append((i, j, s))
+    return found, scorer.stats
+
+
+def _row_blocks(n: int, engine: str, parts: int) -> list[tuple[int, int]]:
+    """Split rows into contiguous blocks of roughly equal pair counts.
+
+    A pairwise row `i` compares against the `n - 1 - i` later strings; an indexed row
+    `j` can only propose earlier strings, so its cost grows with `j`.
+    """
+    weight = (lambda row: n - 1 - row) if engine == "pairwise" else (lambda row: row)
+    target = max(sum(weight(row) for row in range(n)) / parts, 1)
+    blocks = []
+    start = acc = 0
+    for row in range(n):
+        acc += weight(row)
+        if acc >= target:
+            blocks.append((start, row + 1))
+            start, acc = row + 1, 0
+    if start < n:
+        blocks.append((start, n))
+    return blocks
+
+
+def _parallel_similar(
+    uniq: list[str], threshold: float, metric: str, engine: str, jobs: int, counters: dict[str, int]
+) -> list[tuple[str, str, float]]:
+    shm, size = _share_strings(uniq)
+    try:
+        initargs = (shm.name, size, len(uniq), threshold, metric, engine)
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_shard_worker, initargs=initargs) as pool:
+            futures = [pool.submit(_similar_shard, start, stop) for start, stop in _row_blocks(len(uniq), engine, jobs * _BLOCKS_PER_JOB)]
+            found: list[tuple[int, int, float]] = []
+            for future in futures:
+                shard, shard_stats = future.result()
+                found.extend(shard)
+                for key, value in shard_stats.items():
+                    counters[key] += value
+    finally:
+        shm.close()
+        shm.unlink()
+    # Blocks may finish in any order; sorting by index pair restores the serial order.
+    found.sort()
+    return [(uniq[i], uniq[j], s) for i, j, s in found]
+
+
+def _keyed_digester() -> Callable[[bytes], hashlib.blake2b]:
+    """BLAKE2b under a fresh random key, so digests are useless outside this run."""
+    return partial(hashlib.blake2b, key=secrets.token_bytes(32), digest_size=_STREAM_DIGEST_BYTES)
+
+
+class _DigestTable:
+    """Fixed-width digests and their positions in flat arrays, counted one bucket at a time.
+
+    Each entry costs the digest width plus a 4-byte position (8 bytes once positions
+    pass 2**32) and no Python object. `duplicates()` visits the entries bucket by
+    bucket (by last digest byte, found with `bytearray.find`), so only a transient
+    dict for about 1/256 of them exists at once.
+    """
+
+    def __init__(self, width: int = _STREAM_DIGEST_BYTES) -> None:
+        self._width = width
+        self._keys = bytearray()
+        self._positions = array("I")
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def update(self, items: Iterable[tuple[bytes, int]]) -> None:
+        """Add each `(digest, position)`; positions must arrive in increasing order."""
+        keys, positions = self._keys, self._positions
+        for digest, position in items:
+            keys += digest
+            try:
+                positions.append(position)
+            except OverflowError:
+                positions = self._positions = array("Q", positions)
+                positions.append(position)
+
+    def duplicates(self) -> list[ExactReuse]:
+        """Digests seen more than once, ordered by first position."""
+        keys, positions, w = self._keys, self._positions, self._width
+        last = keys[w - 1 :: w]
+        found: list[ExactReuse] = []
+        for bucket in range(256):
+            seen: dict[bytes, list[int]] = {}
+            k = last.find(bucket)
+            while k >= 0:
+                digest = bytes(keys[k * w : k * w + w])
+                entry = seen.get(digest)
+                if entry is None:
+                    seen[digest] = [positions[k], 1]
+                else:
+                    entry[1] += 1
+                k = last.find(bucket, k + 1)
+            found.extend(ExactReuse(first, count) for first, count in seen.values() if count > 1)
+        found.sort()
+        return found
+
+
+def count_exact_reuse(passwords: Iterable[str]) -> list[ExactReuse]:
+    """Count exact duplicates without keeping any plaintext.
+
+    Each password is replaced by a 16-byte keyed BLAKE2b digest (random key per call)
+    in an array-backed table, so the heap holds no password strings beyond the
+    caller's own and no per-entry objects. Duplicates are reported by the 1-based
+    position of their first occurrence; empty strings are skipped but keep their
+    position. Use `stream_exact_reuse` when even the digests do not fit in memory.
+    """
+    started = metrics.clock()
+    digest = _keyed_digester()
+    table = _DigestTable()
+    total = 0
+
+    def digests() -> Iterator[tuple[bytes, int]]:
+        nonlocal total
+        for position, pwd in enumerate(passwords, 1):
+            if pwd:
+                total += 1
+                yield digest(pwd.encode("utf-8")).digest(), position
+
+    table.update(digests())
+    metrics.observe("reuse_digest", started, total)
+    return table.duplicates()
+
+
+def stream_exact_reuse(lines: Iterable[str], tmp_dir: str | Path | None = None) -> Iterator[ExactReuse]:
+    """Count exact duplicates in one-password-per-line input of any size.
+
+    Each password is reduced to a keyed BLAKE2b digest under a random per-call key and
+    spilled with its line number into 256 partitions by first digest byte; each
+    partition is then counted on its own in a `_DigestTable`. Memory holds only
+    fixed-size digests for about 1/256 of the input, and neither memory nor the spill files
+    (which need about 24 bytes per line) ever contain plaintext. Duplicates are
+    reported by first line number, partition by partition. Blank lines are skipped.
+    """
+    started = metrics.clock()
+    digest = _keyed_digester()
+    total = 0
+    with SpillPartitions(tmp_dir) as spill:
+        for lineno, line in enumerate(lines, 1):
+            pwd = line.rstrip("\r\n")
+            if not pwd:
+                continue
+            key = digest(pwd.encode("utf-8")).digest()
+            spill.add(key[0], _STREAM_SPILL.pack(key, lineno))
+            total += 1
 
+        for records in spill.drain():
+            table = _DigestTable()
+            table.update(_STREAM_SPILL.iter_unpack(records))
+            del records
+            yield from table.duplicates()
+    metrics.observe("reuse_stream", started, total)
@@ -2,15 +2,25 @@
 
 from __future__ import annotations
 
-import logging
+import hashlib
 import math
 import re
-from typing import Any
+import string
+from array import array
+from bisect import bisect_right
+from itertools import accumulate, islice
+from pathlib import Path
+from typing import Any, Iterable, Iterator, NamedTuple
 
-log = logging.getLogger(__name__)
+import metrics
+from analysis_cache import AnalysisCache
+from breach import BreachIndex
+from guesses import estimate_guesses, guesses_to_score
+from patterns import SequenceDetector
+from wordlist import WordlistIndex, leet_key
 
-
-_COMMON_PASSWORDS = {
+# Ordered roughly by popularity; position is the dictionary rank used by guess estimation.
+_COMMON_PASSWORDS_RANKED = (
     "123456","password","12345678","qwerty","123456789","12345","1234","111111","1234567","dragon",
     "baseball","iloveyou","trustno1","123123","sunshine","master","welcome","shadow","ashley","football",
     "jesus","michael","ninja","mustang","password1","password123","admin","login","princess","qwerty123",
@@ -20,82 +30,241 @@ _COMMON_PASSWORDS = {
     "qwerty1","qwerty!","qwert","qwert!","pass","pass123","welcome1","welcome123","abcd1234","qweasd",
     "pepper","harley","ranger","charlie","daniel","hunter","buster","taylor","andrew","thomas","joshua",
     "soccer","starwars","jennifer","love","orange","computer","michelle","123abc","1q2w3e","q1w2e3",
-}
+)
+_COMMON_PASSWORDS = frozenset(_COMMON_PASSWORDS_RANKED)
+
+_COMMON_RANKS = {word: rank for rank, word in enumerate(_COMMON_PASSWORDS_RANKED, 1)}
+_COMMON_LEET_RANKS: dict[str, int] = {}
+for _rank, _word in enumerate(_COMMON_PASSWORDS_RANKED, 1):
+    _COMMON_LEET_RANKS.setdefault(leet_key(_word), _rank)
+del _rank, _word
+
+SCORING_MODES = ("entropy", "guesses")
+# Bump whenever `_compute_analysis` can return different results for the same input.
+SCORER_VERSION = 2
+
+_sequence_detector = SequenceDetector()
+_dictionary: WordlistIndex | None = None
+_breach_index: BreachIndex | None = None
+_cache: AnalysisCache | None = None
+
+# Passwords seen at least this often in breaches are penalized like common passwords.
+_BREACH_COMMON_THRESHOLD = 100
+
+
+def use_sequence_detector(detector: SequenceDetector) -> None:
+    """Replace the keyboard/sequence detector, e.g. for another `k` or keyboard layout."""
+    global _sequence_detector
+    _sequence_detector = detector
+    _invalidate_cache()
+
+
+def use_dictionary(index: WordlistIndex | str | Path | None) -> None:
+    """Check passwords against a compiled wordlist index in addition to the built-in list.
+
+    Accepts an open `WordlistIndex` or a path to one; `None` reverts to the built-in list.
+    """
+    global _dictionary
+    if isinstance(index, (str, Path)):
+        index = WordlistIndex(index)
+    _dictionary = index
+    _invalidate_cache()
+
+
+def use_breach_index(index: BreachIndex | str | Path | None) -> None:
+    """Report and penalize breach counts from a local breach index; `None` disables it."""
+    global _breach_index
+    if isinstance(index, (str, Path)):
+        index = BreachIndex(index)
+    _breach_index = index
+    _invalidate_cache()
+
+
+def enable_analysis_cache(maxsize: int = 4096) -> AnalysisCache:
+    """Memoize analysis results in a bounded LRU cache keyed by a keyed hash, not the plaintext.
+
+    Returns the cache for statistics (`info()`), invalidation and `secure_clear()`.
+    """
+    global _cache
+    if _cache is not None:
+        _cache.secure_clear()
+    _cache = AnalysisCache(maxsize)
+    return _cache
+
+
+def disable_analysis_cache() -> None:
+    """Securely clear and detach the analysis cache, if enabled."""
+    global _cache
+    if _cache is not None:
+        _cache.secure_clear()
+    _cache = None
+
+
+def analysis_cache() -> AnalysisCache | None:
+    """Return the active analysis cache, or None when caching is disabled."""
+    return _cache
+
+
+def scorer_version(scoring: str = "entropy") -> str:
+    """Tag identifying the rules and configuration behind analysis results.
+
+    Covers `SCORER_VERSION`, the scoring mode, the sequence detector and any
+    dictionary or breach index in use (by its `fingerprint`, so a rebuilt index
+    changes the tag); results saved under another tag are stale.
+    """
+    _check_scoring(scoring)
+    rows = hashlib.blake2b("\n".join(_sequence_detector.rows).encode("utf-8"), digest_size=4).hexdigest()
+    dictionary = f"{_dictionary.path.name}:{_dictionary.fingerprint}" if _dictionary is not None else "-"
+    breaches = f"{_breach_index.path.name}:{_breach_index.fingerprint}" if _breach_index is not None else "-"
+    return f"{SCORER_VERSION}/{scoring}/k{_sequence_detector.k}:{rows}/{dictionary}/{breaches}"
+
+
+def _invalidate_cache() -> None:
+    if _cache is not None:
+        _cache.clear()
+
+
+class PasswordAnalysis(NamedTuple):
+    """Compact analysis record carrying the same fields as `analyze_password`."""
+
+    score: int
+    entropy_bits: float
+    length: int
+    lower: bool
+    upper: bool
+    digit: bool
+    symbol: bool
+    common: bool
+    sequence: bool
+    keyboard: bool
+    repeats: bool
+    categories: int
+    breach_count: int
+    guesses_log10: float | None = None
+
+
+_EMPTY_ANALYSIS = PasswordAnalysis(0, 0.0, 0, False, False, False, False, False, False, False, False, 0, 0)
+
+_ASCII_LOWER = frozenset(string.ascii_lowercase)
+_ASCII_UPPER = frozenset(string.ascii_uppercase)
+_ASCII_DIGITS = frozenset(string.digits)
+_ASCII_ALNUM = _ASCII_LOWER | _ASCII_UPPER | _ASCII_DIGITS
+_REPEAT_RE = re.compile(r"(.)\1{2,}")
 
-_KEYBOARD_ROWS = (
-    "qwertyuiop",
-    "asdfghjkl",
-    "zxcvbnm",
-    "1234567890",
+# Category bitmask (lower=1, upper=2, digit=4, symbol=8) -> charset size, category count.
+_MASK_CHARSET = tuple(26 * (m & 1) + 26 * (m >> 1 & 1) + 10 * (m >> 2 & 1) + 32 * (m >> 3 & 1) for m in range(16))
+_MASK_BITS_PER_CHAR = tuple(math.log2(c) if c > 0 else 0.0 for c in _MASK_CHARSET)
+_MASK_CATEGORIES = tuple(bin(m).count("1") for m in range(16))
+_CATEGORY_POINTS = (0, 0, 1, 2, 3)
+
+# Batches join ASCII passwords with this character (none may contain it) for whole-batch passes.
+_SEP = "\x00"
+# ASCII character -> its category class: a (lower), A (upper), 0 (digit) or ! (symbol).
+_CLASS_TABLE = str.maketrans(
+    {c: "a" if c in _ASCII_LOWER else "A" if c in _ASCII_UPPER else "0" if c in _ASCII_DIGITS else "!" for c in map(chr, range(1, 128))}
 )
 
+_BATCH_SIZE = 4096
+
+
+def _category_mask(pwd: str) -> int:
+    if pwd.isascii():
+        chars = set(pwd)
+        lower = not _ASCII_LOWER.isdisjoint(chars)
+        upper = not _ASCII_UPPER.isdisjoint(chars)
+        digit = not _ASCII_DIGITS.isdisjoint(chars)
+        symbol = not chars <= _ASCII_ALNUM
+    else:
+        lower = any(c.islower() for c in pwd)
+        upper = any(c.isupper() for c in pwd)
+        digit = any(c.isdigit() for c in pwd)
+        symbol = any(not c.isalnum() for c in pwd)
+    return lower | upper << 1 | digit << 2 | symbol << 3
+
 
-def _has_keyboard_sequence(s: str) -> bool:
-    low = s.lower()
-    for row in _KEYBOARD_ROWS:
-        if _has_sequence_in(low, row) or _has_sequence_in(low, row[::-1]):
-            return True
-    return False
+def _check_scoring(scoring: str) -> None:
+    if scoring not in SCORING_MODES:
+        raise ValueError(f"scoring must be one of {', '.join(SCORING_MODES)}")
 
 
-def _has_sequence_in(s: str, seq: str, k: int = 4) -> bool:
-    for i in range(len(seq) - k + 1):
-        sub = seq[i : i + k]
-        if sub in s:
-            return True
-    return False
+def _dictionary_rank(word: str) -> int | None:
+    ranks = [r for r in (_COMMON_RANKS.get(word), _dictionary.rank(word) if _dictionary is not None else None) if r is not None]
+    return min(ranks) if ranks else None
 
 
-def _has_monotonic_sequence(s: str, k: int = 4) -> bool:
-    if len(s) < k:
+def _dictionary_leet_rank(word: str) -> int | None:
+    ranks = [
+        r
+        for r in (_COMMON_LEET_RANKS.get(leet_key(word)), _dictionary.leet_rank(word) if _dictionary is not None else None)
+        if r is not None
+    ]
+    return min(ranks) if ranks else None
+
+
+def _is_common(low: str, leet: str) -> bool:
+    # Exact match first, then one lookup of the leetspeak-normalized key.
+    if low in _COMMON_PASSWORDS or leet in _COMMON_LEET_RANKS:
+        return True
+    if _dictionary is None:
         return False
-    for i in range(len(s) - k + 1):
-        chunk = s[i : i + k]
-        if all(ord(chunk[j + 1]) - ord(chunk[j]) == 1 for j in range(k - 1)):
-            return True
-        if all(ord(chunk[j]) - ord(chunk[j + 1]) == 1 for j in range(k - 1)):
-            return True
-    return False
+    return _dictionary.rank(low) is not None or _dictionary.leet_rank(low) is not None
+
+
+def _analyze(pwd: str, scoring: str = "entropy") -> PasswordAnalysis:
+    cache = _cache
+    if cache is None:
+        return _compute_analysis(pwd, scoring)
+    record = cache.get(pwd, scoring)
+    if record is None:
+        record = _compute_analysis(pwd, scoring)
+        cache.put(pwd, scoring, record)
+    return record
 
 
-def analyze_password(pwd: str) -> dict[str, Any]:
-    """Analyze password characteristics and return scoring details."""
+def _compute_analysis(pwd: str, scoring: str) -> PasswordAnalysis:
     if not pwd:
-        return {
-            "score": 0,
-            "entropy_bits": 0.0,
-            "length": 0,
-            "lower": False,
-            "upper": False,
-            "digit": False,
-            "symbol": False,
-            "common": False,
-            "sequence": False,
-            "keyboard": False,
-            "repeats": False,
-        }
+        return _EMPTY_ANALYSIS if scoring == "entropy" else _EMPTY_ANALYSIS._replace(guesses_log10=0.0)
+    low = pwd.lower()
+    sequence, keyboard = _sequence_detector.flags(low)
+    return _finish_analysis(
+        pwd, scoring, _category_mask(pwd), _is_common(low, leet_key(low)), sequence, keyboard, _REPEAT_RE.search(pwd) is not None
+    )
 
+
+def _compute_batch(passwords: list[str], scoring: str) -> list[PasswordAnalysis]:
+    """`_compute_analysis` for each of `passwords`, with the character-level work batched.
+
+    Non-empty ASCII passwords are joined into one string, so lowercasing, leetspeak keys,
+    category classes and repeated-character runs are each one pass over the batch and
+    pattern flags come from `SequenceDetector.flags_many`; only lookups and the final
+    arithmetic run per password. Anything else takes the single-password path.
+    """
+    batch = [pwd for pwd in passwords if pwd and pwd.isascii() and _SEP not in pwd]
+    if not batch:
+        return [_compute_analysis(pwd, scoring) for pwd in passwords]
+    joined = _SEP.join(batch)
+    lows = joined.lower()
+    low_list = lows.split(_SEP)
+    leets = leet_key(lows).split(_SEP)
+    classes = joined.translate(_CLASS_TABLE).split(_SEP)
+    # ends[j] is the offset of the separator after batch[j].
+    ends = [end - 1 for end in accumulate(len(pwd) + 1 for pwd in batch)]
+    repeats = [False] * len(batch)
+    for match in _REPEAT_RE.finditer(joined):
+        repeats[bisect_right(ends, match.start())] = True
+    flags = _sequence_detector.flags_many(low_list)
+    done: dict[str, PasswordAnalysis] = {}
+    for pwd, low, leet, cls, (sequence, keyboard), repeat in zip(batch, low_list, leets, classes, flags, repeats, strict=True):
+        mask = ("a" in cls) | ("A" in cls) << 1 | ("0" in cls) << 2 | ("!" in cls) << 3
+        done[pwd] = _finish_analysis(pwd, scoring, mask, _is_common(low, leet), sequence, keyboard, repeat)
+    return [done[pwd] if pwd in done else _compute_analysis(pwd, scoring) for pwd in passwords]
+
+
+def _finish_analysis(pwd: str, scoring: str, mask: int, common: bool, sequence: bool, keyboard: bool, repeats: bool) -> PasswordAnalysis:
     length = len(pwd)
-    lower = any(c.islower() for c in pwd)
-    upper = any(c.isupper() for c in pwd)
-    digit = any(c.isdigit() for c in pwd)
-    symbol = any(not c.isalnum() for c in pwd)
-
-    charset = 0
-    if lower:
-        charset += 26
-    if upper:
-        charset += 26
-    if digit:
-        charset += 10
-    if symbol:
-        charset += 32
-    entropy_bits = length * math.log2(charset) if charset > 0 else 0.0
-
-    common = pwd.lower() in _COMMON_PASSWORDS
-    repeats = bool(re.search(r"(.)\1{2,}", pwd))
-    sequence = _has_monotonic_sequence(pwd.lower(), 4)
-    keyboard = _has_keyboard_sequence(pwd)
+    entropy_bits = length * _MASK_BITS_PER_CHAR[mask]
+    cats = _MASK_CATEGORIES[mask]
+    breach_count = _breach_index.count(pwd) if _breach_index is not None else 0
 
     score = 0
     if length >= 16:
@@ -105,13 +274,7 @@ def analyze_password(pwd: str) -> dict[str, Any]:
     elif length >= 8:
         score += 1
 
-    cats = sum([1 if lower else 0, 1 if upper else 0, 1 if digit else 0, 1 if symbol else 0])
-    if cats >= 4:
-        score += 3
-    elif cats == 3:
-        score += 2
-    elif cats == 2:
-        score += 1
+    score += _CATEGORY_POINTS[cats]
 
     if entropy_bits >= 60:
         score += 4
@@ -122,32 +285,115 @@ def analyze_password(pwd: str) -> dict[str, Any]:
     elif entropy_bits >= 18:
         score += 1
 
-    if common:
-        score -= 5
     if sequence or keyboard:
         score -= 2
     if repeats:
         score -= 1
 
-    score = max(0, min(10, score))
-    result = {
-        "score": score,
-        "entropy_bits": round(entropy_bits, 2),
-        "length": length,
-        "lower": lower,
-        "upper": upper,
-        "digit": digit,
-        "symbol": symbol,
-        "common": common,
-        "sequence": sequence,
-        "keyboard": keyboard,
-        "repeats": repeats,
-        "categories": cats,
-    }
-    log.info("analyze: len=%d cats=%d entropy=%.2f score=%d", length, cats, result["entropy_bits"], score)
+    guesses_log10 = None
+    if scoring == "guesses":
+        estimate = estimate_guesses(pwd, _dictionary_rank, _dictionary_leet_rank, _sequence_detector)
+        guesses_log10 = round(estimate.guesses_log10, 2)
+        score = guesses_to_score(estimate.guesses_log10)
+
+    # Applied in both modes: the guess estimate knows nothing about breach counts.
+    if common or breach_count >= _BREACH_COMMON_THRESHOLD:
+        score -= 5
+    elif breach_count:
+        score -= 3
+
+    return PasswordAnalysis(
+        max(0, min(10, score)),
+        round(entropy_bits, 2),
+        length,
+        bool(mask & 1),
+        bool(mask & 2),
+        bool(mask & 4),
+        bool(mask & 8),
+        common,
+        sequence,
+        keyboard,
+        repeats,
+        cats,
+        breach_count,
+        guesses_log10,
+    )
+
+
+def analyze_password(pwd: str, scoring: str = "entropy") -> dict[str, Any]:
+    """Analyze password characteristics and return scoring details.
+
+    `scoring="entropy"` (default) uses the charset-entropy heuristic; `scoring="guesses"`
+    derives the score from a pattern-based guess estimate and reports `guesses_log10`.
+    """
+    _check_scoring(scoring)
+    started = metrics.clock()
+    result = _analyze(pwd, scoring)._asdict()
+    metrics.observe("analyze", started)
     return result
 
 
-def score_password(pwd: str) -> int:
+def _analyze_chunk(chunk: list[str], scoring: str) -> list[PasswordAnalysis]:
+    # Audit exports repeat the same weak passwords heavily; analyze each distinct value once per chunk.
+    # The analysis cache is bypassed: keying every bulk entry costs more than the memo saves,
+    # and a bulk run would evict the interactive working set.
+    distinct = list(dict.fromkeys(chunk))
+    memo = dict(zip(distinct, _compute_batch(distinct, scoring), strict=True))
+    return [memo[pwd] for pwd in chunk]
+
+
+def _iter_chunks(passwords: Iterable[str], chunk_size: int) -> Iterator[list[str]]:
+    it = iter(passwords)
+    while True:
+        chunk = list(islice(it, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def analyze_passwords(
+    passwords: Iterable[str],
+    as_records: bool = False,
+    chunk_size: int = _BATCH_SIZE,
+    scoring: str = "entropy",
+) -> Iterator[dict[str, Any]] | Iterator[PasswordAnalysis]:
+    """Stream analysis results for many passwords, in input order.
+
+    Results are identical to `analyze_password`. With `as_records=True` each item is a
+    `PasswordAnalysis` tuple instead of a dict, which avoids per-password dict allocation.
+    Input is consumed lazily in chunks of `chunk_size`.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be greater than zero")
+    _check_scoring(scoring)
+    for chunk in _iter_chunks(passwords, chunk_size):
+        started = metrics.clock()
+        records = _analyze_chunk(chunk, scoring)
+        metrics.observe("analyze_batch", started, len(chunk))
+        if as_records:
+            yield from records
+        else:
+            for record in records:
+                yield record._asdict()
+
+
+def score_password(pwd: str, scoring: str = "entropy") -> int:
     """Return only the normalized 0-10 score for a password."""
-    return analyze_password(pwd)["score"]
+    _check_scoring(scoring)
+    started = metrics.clock()
+    score = _analyze(pwd, scoring).score
+    metrics.observe("analyze", started)
+    return score
+
+
+def score_passwords(passwords: Iterable[str], chunk_size: int = _BATCH_SIZE, scoring: str = "entropy") -> array:
+    """Return the 0-10 scores for many passwords as a compact byte array."""
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be greater than zero")
+    _check_scoring(scoring)
+    scores = array("B")
+    for chunk in _iter_chunks(passwords, chunk_size):
+        started = metrics.clock()
+        scores.extend(record.score for record in _analyze_chunk(chunk, scoring))
+        metrics.observe("analyze_batch", started, len(chunk))
+    return scores
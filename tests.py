@@ -2,21 +2,60 @@
 
 from __future__ import annotations
 
+import hashlib
+import os
+import random
+import subprocess
+import sys
 import tempfile
 import tkinter as tk
 import unittest
 from pathlib import Path
+from unittest import mock
 
 try:
     from cryptography.fernet import InvalidToken
 except Exception:
     InvalidToken = ValueError
 
+import metrics
+import storage
+import strength_checker
+from analysis_cache import AnalysisCache
+from audit import audit_lines
+from breach import BreachIndex, build_breach_index
+from edit_distance import damerau_levenshtein, levenshtein
 from generator import generate_password
+from guesses import estimate_guesses
 from gui import PasswordHealthAnalyzerApp
-from reuse_detector import detect_reuse
-from storage import load_passwords, save_passwords
-from strength_checker import analyze_password, score_password
+from indexfile import SpillPartitions
+from patterns import KEYBOARD_LAYOUTS, SequenceDetector
+from reuse_detector import (
+    ENGINES,
+    ExactReuse,
+    ReuseCluster,
+    ReuseIndex,
+    cluster_reuse,
+    count_exact_reuse,
+    detect_reuse,
+    detect_reuse_within,
+    stream_exact_reuse,
+)
+from storage import SEGMENT_SIZE, KdfParams, VaultAnalysis, VaultLockedError, VaultSession, load_passwords, load_vault, save_passwords
+from strength_checker import (
+    SCORING_MODES,
+    PasswordAnalysis,
+    analyze_password,
+    analyze_passwords,
+    disable_analysis_cache,
+    enable_analysis_cache,
+    score_password,
+    score_passwords,
+    use_breach_index,
+    use_dictionary,
+)
+from vault_health import assess, to_vault_analysis
+from wordlist import WordlistIndex, build_index
 
 
 class TestStrengthChecker(unittest.TestCase):
@@ -34,6 +73,207 @@ class TestStrengthChecker(unittest.TestCase):
         self.assertGreaterEqual(result["entropy_bits"], 30)
         self.assertGreaterEqual(result["categories"], 3)
 
+    def test_leet_variants_are_common(self) -> None:
+        self.assertTrue(analyze_password("P@ssw0rd")["common"])
+        self.assertTrue(analyze_password("$unsh1ne")["common"])
+        self.assertFalse(analyze_password("Zq!8vLr#2mTp")["common"])
+
+    def test_batch_matches_single(self) -> None:
+        data = ["", "qwerty", "Abcd1234!@", "A_Stronger-P@ssw0rd!!", "qwerty", "\u00e9t\u00e9Ete2026"]
+        # Edge cases for the joined whole-batch passes: separators, runs across entries, final sigma.
+        data += ["aa", "a", "aaa", "with\x00nul", "P@$$w0rd", "\u03a3\u0391\u03a3", "9876", "Zz!", "\x01\x02\x03\x04"]
+        self.assertEqual(list(analyze_passwords(data, chunk_size=2)), [analyze_password(p) for p in data])
+
+    def test_batch_records_and_scores(self) -> None:
+        data = ["hunter2", "Unique#Password2026", "hunter2"]
+        records = list(analyze_passwords(data, as_records=True))
+        self.assertIsInstance(records[0], PasswordAnalysis)
+        self.assertEqual([r._asdict() for r in records], [analyze_password(p) for p in data])
+        self.assertEqual(list(score_passwords(data)), [score_password(p) for p in data])
+
+
+class TestAnalysisCache(unittest.TestCase):
+    def test_cached_results_and_stats(self) -> None:
+        cache = enable_analysis_cache(maxsize=2)
+        try:
+            first = analyze_password("hunter2")
+            self.assertEqual(analyze_password("hunter2"), first)
+            self.assertEqual(score_password("hunter2", scoring="guesses"), analyze_password("hunter2", scoring="guesses")["score"])
+            self.assertEqual(cache.info(), (2, 2, 2, 2))
+            analyze_password("another-one")
+            self.assertEqual(len(cache), 2)
+            # Bulk runs neither pay for the cache nor evict the interactive entries.
+            before = cache.info()
+            list(analyze_passwords(["bulk-1", "bulk-2", "hunter2", "bulk-1"]))
+            score_passwords(["bulk-3"])
+            self.assertEqual(cache.info(), before)
+            cache.invalidate("hunter2")
+            self.assertEqual(len(cache), 1)
+        finally:
+            disable_analysis_cache()
+        self.assertEqual(cache.info(), (0, 0, 2, 0))
+
+    def test_entries_are_not_keyed_by_plaintext(self) -> None:
+        cache = AnalysisCache()
+        cache.put("s3cret!", "entropy", 1)
+        self.assertNotIn("s3cret!".encode(), b"".join(cache._entries))
+        old_key = cache._key
+        cache.secure_clear()
+        self.assertEqual(bytes(old_key), bytes(len(old_key)))
+        self.assertIsNone(cache.get("s3cret!", "entropy"))
+
+
+class TestGuessEstimation(unittest.TestCase):
+    def test_patterned_password_scores_low(self) -> None:
+        entropy = analyze_password("qwerty2019")
+        guesses = analyze_password("qwerty2019", scoring="guesses")
+        self.assertIsNone(entropy["guesses_log10"])
+        self.assertLess(guesses["guesses_log10"], 6)
+        self.assertLessEqual(guesses["score"], entropy["score"])
+        self.assertGreaterEqual(score_password("xK9#mQ2$vL7@pR4!", scoring="guesses"), 9)
+
+    def test_minimum_guesses_cover(self) -> None:
+        estimate = estimate_guesses("Password1990", {"password": 2}.get)
+        self.assertEqual([m.pattern for m in estimate.sequence], ["dictionary", "date"])
+        self.assertEqual("".join(m.token for m in estimate.sequence), "Password1990")
+
+    def test_invalid_scoring_raises(self) -> None:
+        with self.assertRaises(ValueError):
+            score_password("abc", scoring="magic")
+
+
+class TestWordlistIndex(unittest.TestCase):
+    def test_build_and_lookup(self) -> None:
+        words = ["Tr0ub4dor", "correcthorse", "", "tr0ub4dor", "zebra42"]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for bloom_bits in (10, 0):
+                path = Path(tmpdir) / f"words{bloom_bits}.phw"
+                self.assertEqual(build_index(words, path, bloom_bits_per_entry=bloom_bits, leet=False), 3)
+                with WordlistIndex(path) as index:
+                    self.assertEqual(len(index), 3)
+                    self.assertEqual(index.rank("TR0UB4DOR"), 1)
+                    self.assertEqual(index.rank("zebra42"), 4)
+                    self.assertNotIn("zebra43", index)
+                    self.assertIsNone(index.leet_rank("Tr0ub4dor"))
+
+    def test_leet_lookup(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "words.phw"
+            self.assertEqual(build_index(["letmein", "troubador", "LetMeIn"], path), 4)
+            with WordlistIndex(path) as index:
+                self.assertEqual((len(index), index.records), (2, 4))
+                self.assertIsNone(index.rank("Tr0ub4d0r"))
+                self.assertEqual(index.leet_rank("Tr0ub4d0r"), 2)
+                self.assertEqual(index.leet_rank("l3tm31n"), 1)
+                self.assertIsNone(index.leet_rank("letmeout"))
+
+    def test_dictionary_feeds_common_flag(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "words.phw"
+            build_index(["Xylophone-Seven"], path)
+            self.assertFalse(analyze_password("xylophone-seven")["common"])
+            index = WordlistIndex(path)
+            use_dictionary(index)
+            try:
+                self.assertTrue(analyze_password("xylophone-seven")["common"])
+            finally:
+                use_dictionary(None)
+                index.close()
+
+
+class TestBreachIndex(unittest.TestCase):
+    def test_build_and_count(self) -> None:
+        def sha1(pwd: str) -> str:
+            return hashlib.sha1(pwd.encode("utf-8")).hexdigest().upper()
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dump = Path(tmpdir) / "dump.txt"
+            dump.write_text(f"{sha1('hunter2')}:3\n{sha1('Zq!8vLr#2mTp')}:7\n\n{sha1('hunter2')}:2\n", encoding="ascii")
+            path = Path(tmpdir) / "pwned.phb"
+            self.assertEqual(build_breach_index([dump], path), 2)
+            index = BreachIndex(path)
+            try:
+                self.assertEqual(index.count("hunter2"), 5)
+                self.assertEqual(index.count("hunter3"), 0)
+                baseline = {mode: analyze_password("Zq!8vLr#2mTp", mode) for mode in SCORING_MODES}
+                use_breach_index(index)
+                try:
+                    breached = {mode: analyze_password("Zq!8vLr#2mTp", mode) for mode in SCORING_MODES}
+                finally:
+                    use_breach_index(None)
+            finally:
+                index.close()
+        for mode in SCORING_MODES:
+            with self.subTest(scoring=mode):
+                self.assertEqual(breached[mode]["breach_count"], 7)
+                self.assertLess(breached[mode]["score"], baseline[mode]["score"])
+
+
+
+class TestIndexFile(unittest.TestCase):
+    def test_records_come_back_per_partition_in_order(self) -> None:
+        records = [bytes([i % 4, i]) for i in range(200)]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with SpillPartitions(tmpdir, partitions=4, buffer_bytes=16) as spill:
+                for record in records:
+                    spill.add(record[0], record)
+                self.assertTrue(any(spill.directory.iterdir()))
+                drained = list(spill.drain())
+                self.assertEqual(list(spill.directory.iterdir()), [])
+            self.assertFalse(spill.directory.exists())
+        self.assertEqual(drained, [b"".join(r for r in records if r[0] == i) for i in range(4)])
+
+    def test_index_fingerprint_changes_on_rebuild(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "words.phw"
+            build_index(["letmein"], path)
+            with WordlistIndex(path) as index:
+                first = index.fingerprint
+            with WordlistIndex(path) as index:
+                self.assertEqual(index.fingerprint, first)
+            build_index(["letmein", "hunter2"], path)
+            with WordlistIndex(path) as index:
+                self.assertNotEqual(index.fingerprint, first)
+
+class TestPatterns(unittest.TestCase):
+    def test_flags_and_spans(self) -> None:
+        detector = SequenceDetector()
+        self.assertEqual(detector.flags("xxQwertyzabcd"), (True, True))
+        self.assertEqual(detector.flags("Zx9!pL2#"), (False, False))
+        spans = [(m.kind, m.start, m.end) for m in detector.find("xxqwertyzabcd")]
+        self.assertEqual(spans, [("keyboard", 2, 8), ("sequence", 9, 13)])
+
+    def test_custom_layout_and_k(self) -> None:
+        detector = SequenceDetector(k=3, rows=KEYBOARD_LAYOUTS["azerty"])
+        self.assertEqual(detector.flags("Aze!"), (False, True))
+        self.assertEqual(SequenceDetector().flags("Aze!"), (False, False))
+
+    def test_flags_many_matches_flags(self) -> None:
+        rng = random.Random(11)
+        data = ["abc", "cba\x01\x02\x03\x04", "\x00abcd", "", "Qwer", "zyxw", "\u03b1\u03b2\u03b3\u03b4", "89", "0123"]
+        data += ["".join(rng.choices("abcdqwer1234zyx!\x00\x01", k=rng.randint(0, 9))) for _ in range(300)]
+        for detector in (SequenceDetector(), SequenceDetector(k=3, rows=KEYBOARD_LAYOUTS["azerty"])):
+            self.assertEqual(detector.flags_many(data), [detector.flags(s) for s in data])
+
+
+class TestEditDistance(unittest.TestCase):
+    def test_known_distances(self) -> None:
+        self.assertEqual(levenshtein("kitten", "sitting"), 3)
+        self.assertEqual(levenshtein("", "abc"), 3)
+        self.assertEqual(levenshtein("ab", "ba"), 2)
+        self.assertEqual(damerau_levenshtein("ab", "ba"), 1)
+        self.assertEqual(damerau_levenshtein("ca", "abc"), 3)
+
+    def test_long_patterns(self) -> None:
+        a = "x" * 100 + "abc"
+        self.assertEqual(levenshtein(a, "x" * 100 + "acb"), 2)
+        self.assertEqual(damerau_levenshtein(a, "x" * 100 + "acb"), 1)
+
+    def test_max_distance_cuts_off(self) -> None:
+        self.assertEqual(levenshtein("hunter2", "hunter3", max_distance=1), 1)
+        self.assertIsNone(levenshtein("hunter2", "Hunt3r22", max_distance=2))
+        self.assertIsNone(damerau_levenshtein("abc", "abcdef", max_distance=2))
+
 
 class TestReuseDetector(unittest.TestCase):
     def test_exact_duplicates(self) -> None:
@@ -59,6 +299,145 @@ class TestReuseDetector(unittest.TestCase):
         with self.assertRaises(ValueError):
             detect_reuse(["a", "b"], similarity_threshold=1.2)
 
+    def test_indexed_engine_matches_pairwise(self) -> None:
+        rng = random.Random(11)
+        base = ["".join(rng.choices("abcde12", k=rng.randint(1, 12))) for _ in range(40)]
+        data = base + [b[: rng.randint(0, len(b))] + rng.choice("ab1!") + b[rng.randint(0, len(b)) :] for b in base]
+        for threshold in (0.0, 0.5, 0.6, 0.75, 0.85, 1.0):
+            with self.subTest(threshold=threshold):
+                self.assertEqual(detect_reuse(data, threshold), detect_reuse(data, threshold, engine="pairwise"))
+
+    def test_indexed_engine_is_unbudgeted_by_default(self) -> None:
+        data = [f"filler{i:05d}xyz" for i in range(200)] + ["Tr0ub4dor&3", "Tr0ub4dor&4"]
+        pairs = {(a, b) for a, b, _ in detect_reuse(data)["similar"]}
+        self.assertIn(("Tr0ub4dor&3", "Tr0ub4dor&4"), pairs)
+
+    def test_filter_stats_reject_before_full_ratio(self) -> None:
+        stats: dict[str, int] = {}
+        data = ["hunter2", "hunter3", "x", "zzzzzzzz"]
+        result = detect_reuse(data, similarity_threshold=0.8, engine="pairwise", stats=stats)
+        self.assertEqual(stats["pairs"], 6)
+        self.assertEqual(stats["pairs"], stats["length"] + stats["histogram"] + stats["scored"])
+        self.assertLess(stats["scored"], stats["pairs"])
+        self.assertEqual([(a, b) for a, b, _ in result["similar"]], [("hunter2", "hunter3")])
+
+    def test_edit_distance_metrics(self) -> None:
+        data = ["hunter2", "hunter3", "password", "pasword", "psasword"]
+        lev = detect_reuse(data, similarity_threshold=0.85, metric="levenshtein")
+        self.assertEqual([(a, b) for a, b, _ in lev["similar"]], [("hunter2", "hunter3"), ("password", "pasword"), ("pasword", "psasword")])
+        self.assertAlmostEqual(lev["similar"][0][2], 6 / 7)
+        dam = detect_reuse(data, similarity_threshold=0.85, metric="damerau")
+        self.assertIn(("password", "psasword", 7 / 8), dam["similar"])
+        self.assertEqual(dam, detect_reuse(data, similarity_threshold=0.85, metric="damerau", engine="pairwise"))
+
+    def test_reuse_index_matches_detect_reuse(self) -> None:
+        data = ["hunter2", "password123", "hunter3", "Passw0rd!23", "password123", "", "qwerty"]
+        for metric in ("ratio", "damerau"):
+            with self.subTest(metric=metric):
+                self.assertEqual(ReuseIndex(data, 0.8, metric).result(), detect_reuse(data, 0.8, metric=metric))
+
+    def test_reuse_index_updates_incrementally(self) -> None:
+        index = ReuseIndex(["hunter2", "qwerty", "qwerty"], similarity_threshold=0.8)
+        self.assertEqual(index.count("qwerty"), 2)
+        index.add("hunter3")
+        self.assertEqual([other for other, _ in index.similar_to("hunter3")], ["hunter2"])
+        index.replace("hunter2", "correct horse")
+        self.assertEqual(index.similar_to("hunter3"), [])
+        index.remove("qwerty")
+        self.assertEqual(index.result(), {"exact": {}, "similar": []})
+        self.assertEqual(len(index), 3)
+        with self.assertRaises(KeyError):
+            index.remove("qwerty2")
+
+    def test_reuse_index_after_replace_matches_current_list(self) -> None:
+        def pairs(result: dict) -> dict[frozenset[str], float]:
+            return {frozenset((a, b)): score for a, b, score in result["similar"]}
+
+        # difflib's ratio is asymmetric here (0.73 one way, 0.55 the other); edits must not flip it.
+        data = ["zzz", "cac1ca"]
+        index = ReuseIndex(data, 0.7)
+        data[0] = "ca1bc"
+        index.replace("zzz", "ca1bc")
+        self.assertEqual(pairs(index.result()), pairs(detect_reuse(data, 0.7)))
+        self.assertTrue(index.similar_to("ca1bc"))
+
+        rng = random.Random(13)
+        for _ in range(40):
+            data = ["".join(rng.choices("abc1", k=rng.randint(3, 7))) for _ in range(6)]
+            index = ReuseIndex(data, 0.7)
+            for _ in range(8):
+                pwd = "".join(rng.choices("abc1", k=rng.randint(3, 7)))
+                action = rng.randrange(3)
+                if action == 0 or not data:
+                    data.append(pwd)
+                    index.add(pwd)
+                elif action == 1:
+                    index.remove(data.pop(rng.randrange(len(data))))
+                else:
+                    k = rng.randrange(len(data))
+                    index.replace(data[k], pwd)
+                    data[k] = pwd
+            self.assertEqual(pairs(index.result()), pairs(detect_reuse(data, 0.7)))
+            self.assertEqual(
+                {frozenset(c.members) for c in index.clusters()}, {frozenset(c.members) for c in cluster_reuse(data, 0.7)}
+            )
+
+    def test_parallel_matches_serial(self) -> None:
+        rng = random.Random(5)
+        base = ["".join(rng.choices("abcdef123", k=rng.randint(2, 10))) for _ in range(60)]
+        data = base + [b[:2] + "x" + b[2:] for b in base]
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                serial: dict[str, int] = {}
+                parallel: dict[str, int] = {}
+                expected = detect_reuse(data, 0.75, engine=engine, stats=serial)
+                self.assertEqual(detect_reuse(data, 0.75, engine=engine, jobs=2, stats=parallel), expected)
+                self.assertEqual(parallel, serial)
+
+    def test_stream_exact_reuse(self) -> None:
+        lines = ["hunter2\n", "qwerty\n", "\n", "hunter2\r\n", "unique\n", "hunter2\n", "qwerty"]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            found = sorted(stream_exact_reuse(lines, tmp_dir=tmpdir))
+            self.assertEqual(list(Path(tmpdir).iterdir()), [])
+        self.assertEqual(found, [ExactReuse(line=1, count=3), ExactReuse(line=2, count=2)])
+
+    def test_count_exact_reuse_by_position(self) -> None:
+        data = ["hunter2", "", "qwerty", "hunter2", "x", "hunter2", "qwerty"]
+        self.assertEqual(count_exact_reuse(data), [ExactReuse(1, 3), ExactReuse(3, 2)])
+        many = [f"pw{i % 1500}" for i in range(4000)]
+        found = count_exact_reuse(iter(many))
+        self.assertEqual(len(found), 1500)
+        self.assertEqual(sum(count for _, count in found), 4000)
+
+    def test_cluster_reuse_groups_variant_families(self) -> None:
+        family = ["Summer2024!"] + [f"Summer2024!{c}" for c in "abcdefghij"]
+        data = ["hunter2", *family, "unrelated-passphrase", "hunter3", "Summer2024!"]
+        self.assertEqual(len(detect_reuse(data)["similar"]), 56)
+        clusters = cluster_reuse(data)
+        self.assertEqual(clusters, [ReuseCluster("hunter2", ("hunter2", "hunter3")), ReuseCluster("Summer2024!", tuple(family))])
+        for engine in ENGINES:
+            self.assertEqual(cluster_reuse(data, engine=engine, metric="damerau"), ReuseIndex(data, metric="damerau").clusters())
+
+    def test_time_budgeted_search(self) -> None:
+        rng = random.Random(7)
+        base = ["".join(rng.choices("abcdef123", k=rng.randint(4, 10))) for _ in range(80)]
+        data = base + [b + "!" for b in base] + base[:5]
+        stats: dict[str, int] = {}
+        full = detect_reuse_within(data, 60_000, 0.8, stats=stats)
+        self.assertTrue(full["complete"])
+        self.assertEqual(full["coverage"], 1.0)
+        self.assertEqual(stats["pairs"], 160 * 159 // 2)
+        self.assertEqual({"exact": full["exact"], "similar": full["similar"]}, detect_reuse(data, 0.8))
+        expired = detect_reuse_within(data, 0)
+        self.assertEqual((expired["coverage"], expired["complete"], expired["similar"]), (0.0, False, []))
+        self.assertEqual(expired["exact"], full["exact"])
+        with self.assertRaises(ValueError):
+            detect_reuse_within(data, -1)
+
+    def test_invalid_engine_raises(self) -> None:
+        with self.assertRaises(ValueError):
+            detect_reuse(["a", "b"], engine="fast")
+
 
 class TestGenerator(unittest.TestCase):
     def test_generate_default(self) -> None:
@@ -87,6 +466,265 @@ class TestStorage(unittest.TestCase):
             with self.assertRaises((ValueError, InvalidToken)):
                 load_passwords(path, "wrong-password")
 
+    def test_v2_segments_stream_and_reject_truncation(self) -> None:
+        data = [f"entry-{i}-\u00e9" for i in range(20000)]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "vault.pha"
+            save_passwords(path, iter(data), "master-password")
+            self.assertEqual(path.read_bytes()[:4], b"PHA2")
+            self.assertEqual(load_passwords(path, "master-password"), data)
+            with VaultSession(path, "master-password") as session:
+                self.assertGreater(session.segment_count(), 2)
+                self.assertEqual(len(session.read_segment(1)), SEGMENT_SIZE)
+            legacy = Path(tmpdir) / "legacy.pha"
+            save_passwords(legacy, data, "master-password", version=1)
+            self.assertEqual(load_passwords(legacy, "master-password"), data)
+            # Raw segments instead of base64 inside JSON.
+            self.assertLess(path.stat().st_size, 0.8 * legacy.stat().st_size)
+            # The unauthenticated segment size is bounded before any buffer is allocated.
+            forged = bytearray(path.read_bytes())
+            forged[6:10] = (1 << 31).to_bytes(4, "big")
+            forged_path = Path(tmpdir) / "forged.pha"
+            forged_path.write_bytes(forged)
+            with self.assertRaisesRegex(ValueError, "segment size"):
+                load_passwords(forged_path, "master-password")
+            # A cut-short file must fail: its new last segment was not sealed as final.
+            path.write_bytes(path.read_bytes()[: -SEGMENT_SIZE // 2])
+            with self.assertRaises(ValueError):
+                load_passwords(path, "master-password")
+
+    def test_journaled_changes_replay_and_compact(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "vault.pha"
+            journal = Path(tmpdir) / "vault.pha.journal"
+            with VaultSession(path, "master-password", compact_every=4) as session:
+                session.save(["one", "two", "three"])
+                base = path.read_bytes()
+                session.add("four")
+                session.replace(0, "ONE")
+                before = journal.read_bytes()
+                session.remove(1)
+                self.assertEqual(path.read_bytes(), base)
+                self.assertEqual(load_passwords(path, "master-password"), ["ONE", "three", "four"])
+            full = journal.read_bytes()
+            # Dropping committed records, even at a record boundary, is caught.
+            journal.write_bytes(full[: len(before)])
+            with self.assertRaisesRegex(ValueError, "truncated"):
+                load_passwords(path, "master-password")
+            # A record torn by a crash before its commit is dropped and the next append overwrites it.
+            journal.write_bytes(before + full[len(before) : -3])
+            with VaultSession(path, "master-password", compact_every=4) as session:
+                self.assertEqual(session.load(), ["ONE", "two", "three", "four"])
+                session.add("five")
+                self.assertEqual(session.load(), ["ONE", "two", "three", "four", "five"])
+                session.add("six")
+                self.assertFalse(journal.exists())
+                self.assertEqual(load_passwords(path, "master-password"), ["ONE", "two", "three", "four", "five", "six"])
+
+    def test_journal_rejects_out_of_range_indexes(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "vault.pha"
+            save_passwords(path, ["a", "b", "c"], "master-password")
+            with VaultSession(path, "master-password") as session:
+                with self.assertRaises(IndexError):
+                    session.remove(4)
+                session.remove(2)
+                with self.assertRaises(IndexError):
+                    session.replace(2, "x")
+                session.add("d")
+                session.replace(2, "D")
+                self.assertEqual(session.load(), ["a", "b", "D"])
+                session.compact()
+            self.assertEqual(load_passwords(path, "master-password"), ["a", "b", "D"])
+
+    def test_passwords_that_would_not_read_back_as_one_line_are_rejected(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "vault.pha"
+            for version in (1, 2):
+                for bad in ("", "two\nlines", "form\x0cfeed"):
+                    with self.subTest(version=version, pwd=bad), self.assertRaisesRegex(ValueError, "line breaks"):
+                        save_passwords(path, ["a", bad, "b", "c"], "master-password", version=version)
+            save_passwords(path, ["a", "b", "c"], "master-password")
+            with VaultSession(path, "master-password") as session:
+                with self.assertRaisesRegex(ValueError, "line breaks"):
+                    session.add("")
+                with self.assertRaisesRegex(ValueError, "line breaks"):
+                    session.replace(1, "x\ny")
+                session.replace(2, "X")
+                self.assertEqual(session.load(), ["a", "b", "X"])
+
+    def test_batched_xor_stream_matches_reference(self) -> None:
+        key, iv = bytes(range(32)), bytes(16)
+        for size in (0, 1, 31, 32, 33, 70_000):
+            with self.subTest(size=size):
+                data = random.Random(size).randbytes(size)
+                self.assertEqual(storage._xor_stream(data, key, iv), storage._xor_stream_bytewise(data, key, iv))
+
+    def test_session_reuses_keys_until_locked(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "vault.pha"
+            with VaultSession(path, "master-password") as session:
+                session.save(["one"])
+                session.save(["one", "two"])
+                self.assertEqual(session.load(), ["one", "two"])
+                keys = session._keys
+            self.assertTrue(session.locked)
+            self.assertFalse(any(keys.enc_key))
+            with self.assertRaises(VaultLockedError):
+                session.load()
+            self.assertEqual(load_passwords(path, "master-password"), ["one", "two"])
+            with self.assertRaises((ValueError, InvalidToken)):
+                VaultSession(path, "wrong-password")
+            expired = VaultSession(path, "master-password", timeout=0.0)
+            with self.assertRaises(VaultLockedError):
+                expired.save(["three"])
+            self.assertEqual(load_passwords(path, "master-password"), ["one", "two"])
+
+    def test_vault_records_its_kdf_settings(self) -> None:
+        scrypt = KdfParams("scrypt", n=1 << 10, r=8, p=1)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "vault.pha"
+            for version, kdf in ((2, scrypt), (1, scrypt), (2, KdfParams(iterations=1000))):
+                with self.subTest(version=version, kdf=kdf):
+                    save_passwords(path, ["one", "two"], "master-password", version=version, kdf=kdf)
+                    self.assertEqual(load_passwords(path, "master-password"), ["one", "two"])
+                    with VaultSession(path, "master-password") as session:
+                        self.assertEqual(session._keys.kdf, storage._check_kdf(kdf))
+                        session.save(["one", "two", "three"])
+                    self.assertEqual(load_passwords(path, "master-password"), ["one", "two", "three"])
+            # Settings read from a file are bounded before any work is done.
+            with self.assertRaises(ValueError):
+                storage._check_kdf(KdfParams("scrypt", n=1 << 24, r=64, p=1))
+            with self.assertRaises(ValueError):
+                storage._check_kdf(KdfParams("scrypt", n=1000, r=8, p=1))
+        kdf = storage.calibrate_kdf(1.0)
+        self.assertEqual(kdf.iterations, storage._MIN_PBKDF2_ROUNDS)
+
+    def test_analysis_is_stored_and_follows_the_journal(self) -> None:
+        analysis = VaultAnalysis("scorer-1", [{"score": 1}, {"score": 2}, {"score": 3}])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "vault.pha"
+            for version in (1, 2):
+                with self.subTest(version=version):
+                    save_passwords(path, ["one", "two", "three"], "master-password", version=version, analysis=analysis)
+                    self.assertEqual(load_passwords(path, "master-password"), ["one", "two", "three"])
+                    self.assertEqual(load_vault(path, "master-password"), (["one", "two", "three"], analysis))
+            with VaultSession(path, "master-password") as session:
+                session.replace(0, "ONE")
+                session.remove(1)
+                session.add("four")
+                expected = VaultAnalysis("scorer-1", [None, {"score": 3}, None], changes=3)
+                self.assertEqual(session.load_vault(), (["ONE", "three", "four"], expected))
+                session.compact()
+                self.assertEqual(load_vault(path, "master-password"), (["ONE", "three", "four"], expected))
+            save_passwords(path, ["one"], "master-password")
+            self.assertEqual(load_vault(path, "master-password"), (["one"], None))
+            with self.assertRaises(ValueError):
+                save_passwords(path, ["one", "two"], "master-password", analysis=analysis)
+            with self.assertRaises(ValueError):
+                save_passwords(path, ["\x00analysis"], "master-password")
+            # An empty entry would be skipped on load and misalign the analysis; nothing is written.
+            with self.assertRaises(ValueError):
+                save_passwords(path, ["a", "", "b"], "master-password", analysis=VaultAnalysis("v", [1, 2, 3]))
+            self.assertEqual(load_vault(path, "master-password"), (["one"], None))
+
+
+class TestVaultHealth(unittest.TestCase):
+    def test_only_stale_entries_are_recomputed(self) -> None:
+        passwords = ["hunter2", "Password1", "Password2", "Unique#Password2026", "hunter2"]
+        fresh = assess(passwords)
+        self.assertEqual((fresh.recomputed, fresh.reclustered), (5, True))
+        self.assertEqual(fresh.analyses, list(analyze_passwords(passwords, as_records=True)))
+        self.assertEqual(fresh.clusters[1], fresh.clusters[2])
+        self.assertEqual((fresh.summary.duplicated, fresh.summary.clusters), (2, 1))
+
+        stored = to_vault_analysis(fresh)
+        restored = assess(passwords, stored)
+        self.assertEqual((restored.recomputed, restored.reclustered), (0, False))
+        self.assertEqual(restored.analyses, fresh.analyses)
+        self.assertEqual(restored.clusters, fresh.clusters)
+
+        # An entry changed through the journal: only it is rescored, but groups are redone.
+        stored.entries[0] = None
+        edited = assess(["qwerty", *passwords[1:]], stored._replace(changes=1))
+        self.assertEqual((edited.recomputed, edited.reclustered), (1, True))
+        self.assertEqual(edited.analyses[0], next(analyze_passwords(["qwerty"], as_records=True)))
+        # Other scoring settings invalidate every stored score.
+        self.assertEqual(assess(passwords, to_vault_analysis(fresh), scoring="guesses").recomputed, 5)
+
+    def test_rebuilt_dictionary_changes_the_scorer_tag(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "words.phw"
+            tags = []
+            for words in (["alpha", "bravo"], ["charlie", "delta"]):
+                build_index(words, path)
+                # Same name, same counts: only the file's identity tells the builds apart.
+                os.utime(path, ns=(len(tags), len(tags)))
+                with WordlistIndex(path) as index:
+                    use_dictionary(index)
+                    try:
+                        tags.append(strength_checker.scorer_version())
+                    finally:
+                        use_dictionary(None)
+            self.assertNotEqual(tags[0], tags[1])
+
+
+class TestAudit(unittest.TestCase):
+    def test_parallel_matches_serial(self) -> None:
+        lines = ["hunter2\n", "\n", "Unique#Password2026\r\n", "qwerty"] * 5
+        serial = list(audit_lines(lines, jobs=1, chunk_size=3))
+        self.assertEqual([lineno for lineno, _ in serial[:3]], [1, 3, 4])
+        self.assertEqual(serial[0][1]._asdict(), analyze_password("hunter2"))
+        self.assertEqual(list(audit_lines(lines, jobs=2, chunk_size=3)), serial)
+        self.assertEqual(sorted(audit_lines(lines, jobs=2, chunk_size=3, ordered=False)), serial)
+
+    def test_in_process_run_keeps_caller_indexes(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "words.phw"
+            build_index(["hunter2"], path)
+            with WordlistIndex(path) as index:
+                use_dictionary(index)
+                try:
+                    records = list(audit_lines(["hunter2"], dictionary=str(path)))
+                    self.assertIs(strength_checker._dictionary, index)
+                finally:
+                    use_dictionary(None)
+        self.assertTrue(records[0][1].common)
+
+    def test_cli_does_not_import_tkinter(self) -> None:
+        code = "import sys, main; sys.exit('tkinter' in sys.modules)"
+        self.assertEqual(subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).parent).returncode, 0)
+
+    def test_cli_rejects_bad_option_values(self) -> None:
+        for argv in (["--jobs", "-1"], ["--chunk-size", "0"], ["--test-reuse", "--clusters", "--time-budget-ms", "5"]):
+            with self.subTest(argv=argv):
+                run = subprocess.run([sys.executable, "main.py", *argv], cwd=Path(__file__).parent, capture_output=True, text=True)
+                self.assertEqual(run.returncode, 2)
+                self.assertNotIn("Traceback", run.stderr)
+
+
+class TestMetrics(unittest.TestCase):
+    def tearDown(self) -> None:
+        metrics.disable()
+        metrics.reset()
+
+    def test_disabled_records_nothing(self) -> None:
+        analyze_password("hunter2")
+        self.assertEqual(metrics.snapshot(), {})
+
+    def test_enabled_counts_and_exports(self) -> None:
+        metrics.enable()
+        analyze_password("hunter2")
+        list(analyze_passwords(["a", "b", "c"]))
+        generate_password()
+        detect_reuse(["x", "x"])
+        snap = metrics.snapshot()
+        self.assertEqual(snap["analyze"]["calls"], 1)
+        self.assertEqual(snap["analyze_batch"]["items"], 3)
+        self.assertEqual(set(snap), {"analyze", "analyze_batch", "generate", "reuse"})
+        self.assertEqual(snap["reuse"]["buckets"]["+Inf"], 1)
+        self.assertIn("pha_generate_seconds_count 1", metrics.to_prometheus())
+
 
 class TestGUI(unittest.TestCase):
     def test_create_app_and_add(self) -> None:
@@ -103,6 +741,66 @@ class TestGUI(unittest.TestCase):
         finally:
             app.destroy()
 
+    def test_autosave_saves_whole_list_after_unsaved_changes(self) -> None:
+        try:
+            app = PasswordHealthAnalyzerApp()
+        except tk.TclError:
+            self.skipTest("Tk display is unavailable in this environment.")
+            return
+
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                path = Path(tmpdir) / "vault.pha"
+                save_passwords(path, ["a", "b", "c"], "master-password")
+                app.vault = VaultSession(path, "master-password")
+                app.passwords, app._vault_synced = app.vault.load(), True
+                app.refresh_listbox()
+                app.listbox.selection_set(0)
+                app.remove_selected()
+                self.assertEqual(load_passwords(path, "master-password"), ["a", "b", "c"])
+                # Index 1 is now "c" in the GUI but "b" in the vault: the list is saved whole.
+                app.autosave_var.set(True)
+                app.listbox.selection_set(1)
+                app.remove_selected()
+                self.assertEqual(load_passwords(path, "master-password"), ["b"])
+                app.listbox.selection_set(0)
+                app.remove_selected()
+                self.assertEqual(load_passwords(path, "master-password"), [])
+        finally:
+            app.destroy()
+
+    def test_whitespace_edit_is_rejected_and_saved_vault_loads(self) -> None:
+        try:
+            app = PasswordHealthAnalyzerApp()
+        except tk.TclError:
+            self.skipTest("Tk display is unavailable in this environment.")
+            return
+
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                path = str(Path(tmpdir) / "vault.pha")
+                app.passwords = ["a", "b", "c"]
+                app.refresh_listbox()
+                app.listbox.selection_set(1)
+                with mock.patch("gui.simpledialog.askstring", return_value="   "), mock.patch("gui.messagebox.showinfo"):
+                    app.edit_selected()
+                self.assertEqual(app.passwords, ["a", "b", "c"])
+                with (
+                    mock.patch("gui.filedialog.asksaveasfilename", return_value=path),
+                    mock.patch("gui.filedialog.askopenfilename", return_value=path),
+                    mock.patch("gui.simpledialog.askstring", return_value="master-password"),
+                    mock.patch("gui.messagebox.showinfo"),
+                    mock.patch("gui.messagebox.showerror") as showerror,
+                ):
+                    app.save_list()
+                    app._lock_vault()
+                    app.load_list()
+                showerror.assert_not_called()
+                self.assertEqual(app.passwords, ["a", "b", "c"])
+                self.assertEqual(len(app.analysis.entries), 3)
+        finally:
+            app.destroy()
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)
@@ -0,0 +1,121 @@
+"""Vault health results that are saved inside the vault and reused on load.
+
+`assess` scores every password and groups similar ones, starting from the
+`VaultAnalysis` a vault was saved with: entry results are reused while the scorer
+tag matches and the entry is unchanged, and reuse cluster ids are reused while the
+list itself is unchanged. Only what is stale is recomputed. `to_vault_analysis`
+turns a report back into the record `storage.save_passwords` embeds.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from typing import Any, NamedTuple
+
+import metrics
+from reuse_detector import cluster_reuse
+from storage import VaultAnalysis
+from strength_checker import PasswordAnalysis, analysis_cache, analyze_passwords, scorer_version
+
+# Scores below this count as weak in the summary.
+WEAK_SCORE = 5
+
+_ENTRY_FIELDS = len(PasswordAnalysis._fields) + 1  # analysis fields, then the cluster id
+
+
+class HealthSummary(NamedTuple):
+    """Dashboard totals for a password list."""
+
+    total: int
+    average_score: float
+    weak: int
+    common: int
+    breached: int
+    duplicated: int  # entries whose exact value appears more than once
+    clusters: int
+    clustered: int  # entries in a group of similar passwords
+
+
+class HealthReport(NamedTuple):
+    """Per-entry analysis and reuse cluster ids (-1 for none), aligned with the password list."""
+
+    analyses: list[PasswordAnalysis]
+    clusters: list[int]
+    version: str
+    summary: HealthSummary
+    recomputed: int  # entries analyzed afresh rather than restored
+    reclustered: bool
+
+
+def health_version(scoring: str = "entropy", metric: str = "ratio", similarity_threshold: float = 0.85) -> str:
+    """Tag stored with the results: the scorer tag, then the reuse settings after the last `|`."""
+    return f"{scorer_version(scoring)}|{metric}:{similarity_threshold}"
+
+
+def _cluster_ids(passwords: list[str], similarity_threshold: float, metric: str) -> list[int]:
+    ids: dict[str, int] = {}
+    for cluster_id, cluster in enumerate(cluster_reuse(passwords, similarity_threshold, metric=metric)):
+        for member in cluster.members:
+            ids.setdefault(member, cluster_id)
+    return [ids.get(pwd, -1) for pwd in passwords]
+
+
+def _summarize(passwords: list[str], analyses: list[PasswordAnalysis], clusters: list[int]) -> HealthSummary:
+    counts = Counter(passwords)
+    return HealthSummary(
+        total=len(passwords),
+        average_score=round(sum(a.score for a in analyses) / len(analyses), 2) if analyses else 0.0,
+        weak=sum(a.score < WEAK_SCORE for a in analyses),
+        common=sum(a.common for a in analyses),
+        breached=sum(a.breach_count > 0 for a in analyses),
+        duplicated=sum(counts[pwd] > 1 for pwd in passwords),
+        clusters=len({c for c in clusters if c >= 0}),
+        clustered=sum(c >= 0 for c in clusters),
+    )
+
+
+def assess(
+    passwords: list[str],
+    stored: VaultAnalysis | None = None,
+    scoring: str = "entropy",
+    metric: str = "ratio",
+    similarity_threshold: float = 0.85,
+) -> HealthReport:
+    """Analyze `passwords`, reusing whatever `stored` results are still current.
+
+    Restored analyses also seed the strength checker's analysis cache when it is
+    enabled, so later single-password lookups skip recomputation too.
+    """
+    started = metrics.clock()
+    version = health_version(scoring, metric, similarity_threshold)
+    score_tag, _, reuse_tag = version.rpartition("|")
+    entries: list[Any] = [None] * len(passwords)
+    stored_score_tag = stored_reuse_tag = ""
+    if stored is not None and len(stored.entries) == len(passwords):
+        entries = stored.entries
+        stored_score_tag, _, stored_reuse_tag = stored.version.rpartition("|")
+    valid = [isinstance(entry, list) and len(entry) == _ENTRY_FIELDS for entry in entries]
+
+    scores_current = stored_score_tag == score_tag
+    stale = [i for i, ok in enumerate(valid) if not (scores_current and ok)]
+    fresh = dict(zip(stale, analyze_passwords((passwords[i] for i in stale), as_records=True, scoring=scoring), strict=True))
+    cache = analysis_cache()
+    analyses: list[PasswordAnalysis] = []
+    for i, pwd in enumerate(passwords):
+        record = fresh.get(i)
+        if record is None:
+            record = PasswordAnalysis(*entries[i][:-1])
+            if cache is not None:
+                cache.put(pwd, scoring, record)
+        analyses.append(record)
+
+    # Cluster ids depend on the whole list, so any change since the save invalidates all of them.
+    reclustered = not (stored is not None and stored_reuse_tag == reuse_tag and stored.changes == 0 and all(valid))
+    clusters = _cluster_ids(passwords, similarity_threshold, metric) if reclustered else [entry[-1] for entry in entries]
+    metrics.observe("assess", started, len(stale))
+    return HealthReport(analyses, clusters, version, _summarize(passwords, analyses, clusters), len(stale), reclustered)
+
+
+def to_vault_analysis(report: HealthReport) -> VaultAnalysis:
+    """The record to pass as `analysis=` when saving the list `report` describes."""
+    return VaultAnalysis(report.version, [[*analysis, cluster] for analysis, cluster in zip(report.analyses, report.clusters, strict=True)])
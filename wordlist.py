@@ -0,0 +1,271 @@
+"""Memory-mapped common-password dictionary index.
+
+Wordlists are compiled once into a compact on-disk index: a fixed header, an optional
+Bloom filter, and a table of fixed-width `(key, rank)` records sorted by key, where
+the key is a 64-bit BLAKE2b digest of the lowercased word. Opening an index only maps
+the file, so it loads in milliseconds and pages are shared between processes; each
+lookup is one Bloom probe plus a binary search over the mapped records.
+
+Indexes also store a leetspeak-normalized key for every word (`P@ssw0rd` and
+`password` share the key `password`), so substitution-aware matching costs one extra
+lookup instead of enumerating substitutions per query.
+
+Build an index from one or more plain wordlists (one word per line, most common
+first) with the command below. Building spills records to temporary files and sorts
+them one partition at a time, so memory stays a small fraction of the input:
+
+    python wordlist.py build -o common.phw rockyou.txt
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import math
+import mmap
+import os
+import shutil
+import struct
+import sys
+from pathlib import Path
+from typing import Iterable
+
+from indexfile import SpillPartitions, fingerprint
+
+_MAGIC = b"PHAWORDS"
+_VERSION = 2
+_HEADER = struct.Struct(">8sHHQQIQ")  # magic, version, flags, count, bloom_bits, bloom_hashes, words
+_RECORD = struct.Struct(">QI")  # key, rank
+_SPILL = struct.Struct(">QIB")  # key, rank, 1 for a leetspeak key
+_KEY = struct.Struct(">Q")
+_PERSON = b"pha-wordlist"
+_LEET_PERSON = b"pha-leetspeak"
+
+FLAG_BLOOM = 0x1
+FLAG_LEET = 0x2
+
+# Each substitution class collapses to its representative letter.
+_LEET_CLASSES = {
+    "a": "@4",
+    "b": "8",
+    "e": "3",
+    "g": "9",
+    "i": "1!|l",
+    "o": "0",
+    "s": "$5",
+    "t": "7+",
+}
+_LEET_TABLE = str.maketrans({ch: rep for rep, chars in _LEET_CLASSES.items() for ch in chars})
+
+
+def leet_key(word: str) -> str:
+    """Return the lowercased, substitution-normalized form of `word`."""
+    return word.lower().translate(_LEET_TABLE)
+
+
+def _key(word: str, person: bytes = _PERSON) -> int:
+    """Return the 64-bit record key for a lowercased (or leet-normalized) word."""
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8, person=person).digest(), "big")
+
+
+def _bloom_positions(key: int, bits: int, hashes: int) -> Iterable[int]:
+    # Double hashing; the second hash is a cheap odd remix of the key.
+    step = (key * 0x9E3779B97F4A7C15 >> 17 & 0xFFFFFFFFFFFFFFFF) | 1
+    return ((key + i * step) % bits for i in range(hashes))
+
+
+def build_index(
+    words: Iterable[str],
+    out_path: str | Path,
+    bloom_bits_per_entry: int = 10,
+    leet: bool = True,
+    tmp_dir: str | Path | None = None,
+) -> int:
+    """Compile words into an index file and return the number of records written.
+
+    Words are lowercased; ranks are 1-based positions of each word's first occurrence.
+    Set `bloom_bits_per_entry` to 0 to omit the Bloom filter. With `leet`, a normalized
+    key is stored alongside each word, carrying the best rank of any word that maps to it.
+    Records are spilled into 256 partitions by their top key byte and each partition
+    is sorted on its own, so peak memory is about 1/256 of the records.
+    """
+    if bloom_bits_per_entry < 0:
+        raise ValueError("bloom_bits_per_entry must be non-negative")
+
+    with SpillPartitions(tmp_dir) as spill:
+        rank = 0
+        for word in words:
+            word = word.strip("\r\n").lower()
+            if not word:
+                continue
+            rank += 1
+            key = _key(word)
+            spill.add(key >> 56, _SPILL.pack(key, rank, 0))
+            if leet:
+                key = _key(leet_key(word), _LEET_PERSON)
+                spill.add(key >> 56, _SPILL.pack(key, rank, 1))
+
+        count = word_count = 0
+        records_path = spill.directory / "records.bin"
+        with open(records_path, "wb") as records:
+            for data in spill.drain():
+                # Pack (key, rank, leet flag) into one int so a single sort orders by key, then by best rank.
+                packed = sorted(key << 33 | rank << 1 | flag for key, rank, flag in _SPILL.iter_unpack(data))
+                del data
+                out = bytearray()
+                last_key = word_key = -1
+                for item in packed:
+                    key = item >> 33
+                    if key != last_key:
+                        last_key = key
+                        out += _RECORD.pack(key, item >> 1 & 0xFFFFFFFF)
+                    if not item & 1 and key != word_key:
+                        word_key = key
+                        word_count += 1
+                count += len(out) // _RECORD.size
+                records.write(out)
+
+        flags = FLAG_LEET if leet else 0
+        bloom_bits = bloom_hashes = 0
+        bloom = bytearray()
+        if bloom_bits_per_entry and count:
+            flags |= FLAG_BLOOM
+            bloom_bits = max(64, -(-count * bloom_bits_per_entry // 8) * 8)
+            bloom_hashes = max(1, round(bloom_bits_per_entry * math.log(2)))
+            bloom = bytearray(bloom_bits // 8)
+            with open(records_path, "rb") as fh:
+                while chunk := fh.read(_RECORD.size * 65536):
+                    for key, _ in _RECORD.iter_unpack(chunk):
+                        for pos in _bloom_positions(key, bloom_bits, bloom_hashes):
+                            bloom[pos >> 3] |= 1 << (pos & 7)
+
+        with open(out_path, "wb") as fh:
+            fh.write(_HEADER.pack(_MAGIC, _VERSION, flags, count, bloom_bits, bloom_hashes, word_count))
+            fh.write(bloom)
+            with open(records_path, "rb") as records:
+                shutil.copyfileobj(records, fh)
+    return count
+
+
+def build_index_from_files(
+    paths: Iterable[str | Path],
+    out_path: str | Path,
+    bloom_bits_per_entry: int = 10,
+    leet: bool = True,
+    tmp_dir: str | Path | None = None,
+) -> int:
+    """Compile plain-text wordlists (one word per line) into an index file."""
+
+    def lines() -> Iterable[str]:
+        for path in paths:
+            with open(path, encoding="utf-8", errors="replace") as fh:
+                yield from fh
+
+    return build_index(lines(), out_path, bloom_bits_per_entry, leet, tmp_dir)
+
+
+class WordlistIndex:
+    """Read-only, memory-mapped view of a compiled wordlist index."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        with open(self.path, "rb") as fh:
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            stat = os.fstat(fh.fileno())
+        try:
+            if len(self._mm) < _HEADER.size:
+                raise ValueError(f"Not a wordlist index: {self.path}")
+            magic, version, flags, count, bloom_bits, bloom_hashes, words = _HEADER.unpack_from(self._mm, 0)
+            if magic != _MAGIC:
+                raise ValueError(f"Not a wordlist index: {self.path}")
+            if version != _VERSION:
+                raise ValueError(f"Unsupported wordlist index version: {version}; rebuild it")
+            self.flags = flags
+            self._count = count
+            self._words = words
+            self._bloom_bits = bloom_bits if flags & FLAG_BLOOM else 0
+            self._bloom_hashes = bloom_hashes
+            self._bloom_offset = _HEADER.size
+            self._records_offset = _HEADER.size + self._bloom_bits // 8
+            if len(self._mm) != self._records_offset + count * _RECORD.size:
+                raise ValueError(f"Truncated or corrupted wordlist index: {self.path}")
+            self.fingerprint = fingerprint(self._mm[: _HEADER.size], stat)
+        except Exception:
+            self._mm.close()
+            raise
+
+    def __len__(self) -> int:
+        """Number of distinct words; leetspeak keys are not counted."""
+        return self._words
+
+    @property
+    def records(self) -> int:
+        """Number of lookup records, word and leetspeak keys together."""
+        return self._count
+
+    def __contains__(self, word: object) -> bool:
+        return isinstance(word, str) and self.rank(word) is not None
+
+    def rank(self, word: str) -> int | None:
+        """Return the 1-based popularity rank of `word` (case-insensitive), or None."""
+        return self._lookup(_key(word.lower()))
+
+    def leet_rank(self, word: str) -> int | None:
+        """Return the best rank of any indexed word sharing `word`'s leet-normalized form."""
+        if not self.flags & FLAG_LEET:
+            return None
+        return self._lookup(_key(leet_key(word), _LEET_PERSON))
+
+    def _lookup(self, key: int) -> int | None:
+        if self._bloom_bits:
+            mm = self._mm
+            base = self._bloom_offset
+            for pos in _bloom_positions(key, self._bloom_bits, self._bloom_hashes):
+                if not mm[base + (pos >> 3)] >> (pos & 7) & 1:
+                    return None
+        return self._search(key)
+
+    def _search(self, key: int) -> int | None:
+        mm = self._mm
+        base = self._records_offset
+        size = _RECORD.size
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            (probe,) = _KEY.unpack_from(mm, base + mid * size)
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return _RECORD.unpack_from(mm, base + mid * size)[1]
+        return None
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def __enter__(self) -> WordlistIndex:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Compile wordlists into a memory-mapped dictionary index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Build an index from plain wordlists (most common first)")
+    build.add_argument("wordlists", nargs="+", help="Input wordlist files, one word per line")
+    build.add_argument("--output", "-o", required=True, help="Index file to write")
+    build.add_argument("--bloom-bits", type=int, default=10, help="Bloom filter bits per entry (0 disables)")
+    build.add_argument("--no-leet", action="store_true", help="Skip leetspeak-normalized keys")
+    build.add_argument("--tmp-dir", help="Directory for temporary spill files (needs about 25 bytes per record)")
+    args = parser.parse_args(argv)
+
+    count = build_index_from_files(args.wordlists, args.output, args.bloom_bits, leet=not args.no_leet, tmp_dir=args.tmp_dir)
+    print(f"Wrote {count} index records to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())